@@ -0,0 +1,3 @@
+"""
+Benchmarks for the content pipeline and request building
+"""
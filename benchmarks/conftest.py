@@ -0,0 +1,31 @@
+import os
+import sys
+import tracemalloc
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+@pytest.fixture
+def measure(benchmark):
+    """Benchmark fn(*args) and record its peak Python heap usage in extra_info
+
+    Memory is traced in a separate untimed call so tracemalloc overhead does not
+    distort the timings.
+    """
+    def run(fn, *args, rounds=10):
+        tracemalloc.start()
+        try:
+            fn(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory_mb"] = round(peak / 2**20, 3)
+        return benchmark.pedantic(fn, args=args, rounds=rounds, iterations=1, warmup_rounds=1 if rounds > 3 else 0)
+    return run
+
+@pytest.fixture(scope="session")
+def fake_openai():
+    with FakeOpenAIServer(completion_tokens=200) as server:
+        yield server
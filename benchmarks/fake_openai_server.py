@@ -0,0 +1,180 @@
+"""
+Local OpenAI-compatible chat completions endpoint for offline benchmarks
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeOpenAIServer:
+    """Serves POST /chat/completions (plain and streamed) on a background thread
+
+    Answers are `completion_tokens` words long. Usage includes DeepSeek's
+    prompt cache counters so the whole client path is exercised.
+
+    For load tests the server can imitate a real provider: `latency` seconds
+    before the first token, `tokens_per_second` pacing of the answer, and an
+    `error_rate` share of requests failing with `error_status` (sent with a
+    Retry-After of `retry_after` seconds, if given). GET requests are answered
+    from `pages` (path -> HTML), so web sources can be loaded offline too;
+    each is logged in `page_requests` as (path, monotonic time). With `etags`,
+    pages carry an ETag and a matching If-None-Match is answered with 304.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, completion_tokens=50, latency=0.0,
+                 tokens_per_second=None, error_rate=0.0, error_status=500, retry_after=None,
+                 pages=None, etags=False, seed=0):
+        self.completion_tokens = completion_tokens
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.pages = pages if pages is not None else {}
+        self.etags = etags
+        self.requests = 0
+        self.page_requests = []
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def completion_words(self):
+        return [f"word{i} " for i in range(self.completion_tokens)]
+
+    def next_request_fails(self):
+        """Count a request and decide whether to inject an error into it"""
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def usage(self, body):
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": prompt_tokens + self.completion_tokens,
+            "prompt_cache_hit_tokens": 0,
+            "prompt_cache_miss_tokens": prompt_tokens,
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.page_requests.append((self.path, time.monotonic()))
+                page = server.pages.get(self.path)
+                if page is None:
+                    self.send_json(404, {"error": "not found"})
+                    return
+                data = page.encode() if isinstance(page, str) else page
+                etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"' if server.etags else None
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.next_request_fails():
+                    headers = {"retry-after": str(server.retry_after)} if server.retry_after is not None else None
+                    self.send_json(server.error_status, {"error": {"message": "injected error", "type": "fake"}}, headers)
+                    return
+                if body.get("stream"):
+                    self.stream_completion(body)
+                else:
+                    time.sleep(server.token_delay() * server.completion_tokens)
+                    self.send_json(200, {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(server.completion_words())},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": server.usage(body),
+                    })
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_event(self, payload):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+
+            def stream_completion(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "fake")}
+                delay = server.token_delay()
+                for word in server.completion_words():
+                    if delay:
+                        time.sleep(delay)
+                    self.send_event(dict(chunk, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}]))
+                self.send_event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self.send_event(dict(chunk, choices=[], usage=server.usage(body)))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
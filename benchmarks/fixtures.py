@@ -0,0 +1,141 @@
+"""
+Generated HTML pages and PDFs for benchmarks and tests (no files are checked
+in), a polling helper for the concurrency tests and isolation of the app's
+on-disk stores
+"""
+import itertools
+import os
+import random
+import sys
+import time
+from src.services import conversation_store, knowledge_base
+from src.utils.boilerplate import extract_main_text
+
+WORDS = (
+    "model context token source answer document page section system request latency cache "
+    "retrieval index chunk stream history summary budget question user assistant server"
+).split()
+
+def make_sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_html(size_bytes, seed=0):
+    """A page of roughly size_bytes with navigation, scripts, styles and nested content"""
+    rng = random.Random(seed)
+    head = (
+        "<html><head><title>Benchmark page</title>"
+        "<style>body { font-family: sans-serif; }  .nav { color: red; }</style>"
+        "<script>var tracking = {id: 42, enabled: true};</script></head><body>"
+        "<nav class='nav'><a href='/'>Home</a>  <a href='/docs'>Docs</a>  <a href='/blog'>Blog</a></nav>"
+    )
+    tail = "<footer>Copyright  2024  Example Inc.</footer></body></html>"
+    parts = [head]
+    size = len(head) + len(tail)
+    section = 0
+    while size < size_bytes:
+        section += 1
+        block = (
+            f"<div class='section'><h2>Section {section}</h2>\n"
+            + "".join(f"  <p>{make_sentence(rng)}  {make_sentence(rng)}</p>\n" for _ in range(4))
+            + "<ul>" + "".join(f"<li>{make_sentence(rng, 5)}</li>" for _ in range(3)) + "</ul>"
+            + "<script>console.log('inline');</script></div>\n"
+        )
+        parts.append(block)
+        size += len(block)
+    parts.append(tail)
+    return "".join(parts)
+
+def make_pdf(pages, lines_per_page=45, seed=0):
+    """A minimal valid PDF with `pages` pages of Helvetica text"""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # filled in once the page ids are known
+    kids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1}. {make_sentence(rng, 10)}" for _ in range(lines_per_page)]
+        text = " ".join(f"({line}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 40 800 Td 14 TL {text} ET".encode()
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, contents, font)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+def make_chunks(count, words_per_chunk=40, vocabulary=20000, seed=0):
+    """Chunks of text over a Zipf-like vocabulary, for knowledge base benchmarks"""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocabulary)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+    return [" ".join(rng.choices(vocab, cum_weights=cum_weights, k=words_per_chunk)) for _ in range(count)]
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+HTML_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+PDF_PAGES = [1, 10, 100, 1000]
+
+_html_cache = {}
+_pdf_cache = {}
+_text_cache = {}
+
+def html_page(size):
+    if size not in _html_cache:
+        _html_cache[size] = make_html(size)
+    return _html_cache[size]
+
+def page_url(size):
+    return f"https://bench.example/{size}"
+
+def page_text(size):
+    """Main text of the generated page, as the app extracts it from a scraped page"""
+    if size not in _text_cache:
+        _text_cache[size] = extract_main_text(html_page(size), page_url(size))
+    return _text_cache[size]
+
+def pdf_document(pages):
+    if pages not in _pdf_cache:
+        _pdf_cache[pages] = make_pdf(pages)
+    return _pdf_cache[pages]
+
+def rounds_for(size, large):
+    """Fewer rounds for the big inputs so the suite stays quick"""
+    return 3 if size >= large else 10
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "app.py")
+
+def isolate_stores(directory, monkeypatch):
+    """Point the app's conversation store and knowledge base at `directory` for one test"""
+    db_path = os.path.join(directory, "conversations.sqlite3")
+    kb_dir = os.path.join(directory, "knowledge_base")
+    monkeypatch.setenv("CONVERSATION_DB_PATH", db_path)
+    monkeypatch.setenv("KNOWLEDGE_BASE_DIR", kb_dir)
+    # The modules read those when imported, which an earlier test may have done
+    monkeypatch.setattr(conversation_store, "_conversation_store", conversation_store.ConversationStore(db_path))
+    monkeypatch.setattr(knowledge_base, "_knowledge_base", knowledge_base.KnowledgeBase(kb_dir))
+    # AppTest leaves the app script as __main__; spawned PDF workers would re-run it
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
@@ -0,0 +1,268 @@
+"""
+Load test: N concurrent chat sessions against the local fake DeepSeek server
+
+    python -m benchmarks.load_test --sessions 50 --turns 3 --workers 2 \\
+        --latency 0.5 --tokens-per-second 50 --error-rate 0.02
+
+Each session attaches a source, then asks `turns` questions with its growing
+history. The source is a generated web page served by the fake server or, for
+`--pdf-share` of the sessions, a generated PDF upload. Every question goes
+through the same steps as the UI's process_user_input: load_source,
+prepare_request, the response cache, then a GenerationJob on the shared fair
+scheduler, polled until it finishes. Sessions are spread over `workers`
+processes, like a deployment with several server processes. No network is
+needed.
+
+The report gives throughput, latency and time-to-first-token percentiles
+(measured from the question, so queueing is included), errors by type and
+each worker's peak RSS.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html, make_pdf, make_sentence
+
+POLL_INTERVAL = 0.05
+
+class FakeUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile"""
+
+    def __init__(self, data, name, file_id):
+        super().__init__(data)
+        self.name = name
+        self.file_id = file_id
+        self.size = len(data)
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def run_session(session_id, api_service, config):
+    """One user: attach a source, then ask questions; returns a result per question"""
+    from src.services.chat_service import load_source, prepare_request
+    from src.services.generation_worker import GenerationJob, start_generation
+    from src.services.response_cache import get_response_cache
+
+    rng = random.Random(session_id)
+    url = upload = None
+    if rng.random() < config["pdf_share"]:
+        upload = FakeUpload(config["pdf_bytes"], "load-test.pdf", f"upload-{session_id}")
+    else:
+        url = f"{config['base_url']}/page{rng.randrange(config['pages'])}.html"
+    # Per-session settings and history summary, as st.session_state holds them
+    state = {}
+    history = []
+    results = []
+    for turn in range(config["turns"]):
+        if config["think_time"]:
+            time.sleep(rng.uniform(0, 2 * config["think_time"]))
+        question = f"Question {turn} from session {session_id}: {make_sentence(rng)}"
+        result = {"session": session_id, "turn": turn, "source": "pdf" if upload else "url"}
+        started = time.perf_counter()
+        try:
+            index = load_source(url=url, pdf_file=upload)
+            request = prepare_request(api_service, question, index, history, state, config["max_tokens"])
+            answer = get_response_cache().get(request.cache_key) if config["use_cache"] else None
+            if answer:
+                result.update(cached=True, ttft=time.perf_counter() - started)
+            else:
+                job = GenerationJob(
+                    (session_id, turn), api_service, request.messages,
+                    max_tokens=config["max_tokens"], summary=request.summary
+                )
+                start_generation(job, client_id=session_id)
+                while not job.finished:
+                    time.sleep(POLL_INTERVAL)
+                if job.summary is not None:
+                    job.summary.commit(state)
+                if job.status != "done":
+                    raise job.error or RuntimeError(job.status)
+                answer = job.text
+                if "ttft" in job.timing:
+                    result["ttft"] = job.submitted - started + job.timing["queue"] + job.timing["ttft"]
+                result["usage"] = job.usage or None
+                if config["use_cache"]:
+                    get_response_cache().put(request.cache_key, answer)
+            result.update(status="ok", latency=time.perf_counter() - started)
+        except Exception as e:
+            result.update(status="error", error=type(e).__name__, latency=time.perf_counter() - started)
+            answer = None
+        history.append({"role": "user", "content": question})
+        if answer:
+            history.append({"role": "assistant", "content": answer})
+        results.append(result)
+    return results
+
+def run_worker(config, session_ids, env):
+    """Run sessions as threads in this process, like one server process with many sessions"""
+    os.environ.update(env)
+    from src.services.api_service import DeepSeekAPI
+
+    api_service = DeepSeekAPI("load-test", base_url=config["base_url"])
+    started = time.time()
+    results = []
+    lock = threading.Lock()
+
+    def session(session_id):
+        session_results = run_session(session_id, api_service, config)
+        with lock:
+            results.extend(session_results)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(session_ids))) as pool:
+        list(pool.map(session, session_ids))
+    return {
+        "pid": os.getpid(),
+        "sessions": len(session_ids),
+        "started": started,
+        "finished": time.time(),
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+def run_load(sessions=20, turns=3, workers=1, pdf_share=0.25, pages=20, page_bytes=50_000, pdf_pages=20,
+             max_tokens=500, think_time=0.0, use_cache=False, generation_workers=None, server_options=None):
+    """Run a load test and return its report (see summarize)"""
+    html = make_html(page_bytes)
+    with FakeOpenAIServer(
+        pages={f"/page{i}.html": html for i in range(pages)},
+        **(server_options or {})
+    ) as server, tempfile.TemporaryDirectory() as cache_dir:
+        # Keep caches, spooled uploads and metrics out of the working tree
+        env = {
+            "UPLOAD_SPOOL_DIR": os.path.join(cache_dir, "uploads"),
+            "RESPONSE_CACHE_PATH": os.path.join(cache_dir, "responses.sqlite3"),
+            "METRICS_JSONL_PATH": os.path.join(cache_dir, "request_metrics.jsonl"),
+            "METRICS_PROM_PATH": os.path.join(cache_dir, "metrics.prom"),
+        }
+        if generation_workers:
+            env["GENERATION_WORKERS"] = str(generation_workers)
+        config = {
+            "base_url": server.base_url,
+            "turns": turns,
+            "pdf_share": pdf_share,
+            "pdf_bytes": make_pdf(pdf_pages) if pdf_share else b"",
+            "pages": pages,
+            "max_tokens": max_tokens,
+            "think_time": think_time,
+            "use_cache": use_cache,
+        }
+        ids = list(range(sessions))
+        # Fresh processes, so each worker's peak RSS is its own
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(run_worker, config, ids[i::workers], env) for i in range(workers) if ids[i::workers]]
+            worker_reports = [future.result() for future in futures]
+        return {
+            "sessions": sessions,
+            "turns": turns,
+            "workers": worker_reports,
+            "server": {"requests": server.requests, "injected_errors": server.errors},
+        }
+
+def summarize(report):
+    """Throughput, latency/TTFT percentiles, errors and peak RSS of a load test report"""
+    from src.utils.stats import summarize_latencies
+
+    results = [r for worker in report["workers"] for r in worker["results"]]
+    ok = [r for r in results if r["status"] == "ok"]
+    elapsed = max(w["finished"] for w in report["workers"]) - min(w["started"] for w in report["workers"])
+    tokens = sum((r.get("usage") or {}).get("total_tokens") or 0 for r in ok)
+    errors = {}
+    for r in results:
+        if r["status"] != "ok":
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "sessions": report["sessions"],
+        "questions": len(results),
+        "answered": len(ok),
+        "errors": errors,
+        "elapsed": elapsed,
+        "answers_per_second": len(ok) / elapsed if elapsed else None,
+        "tokens_per_second": tokens / elapsed if elapsed else None,
+        "latency": summarize_latencies([r["latency"] for r in ok]),
+        "ttft": summarize_latencies([r["ttft"] for r in ok if r.get("ttft") is not None]),
+        "peak_rss_mb": {str(w["pid"]): round(w["peak_rss_mb"], 1) for w in report["workers"]},
+        "server": report["server"],
+    }
+
+def print_summary(summary, out=sys.stderr):
+    def fmt(percentiles):
+        return " ".join(f"{k}={v:.2f}s" if v is not None else f"{k}=n/a" for k, v in percentiles.items())
+
+    print(f"{summary['answered']}/{summary['questions']} questions from {summary['sessions']} sessions "
+          f"answered in {summary['elapsed']:.1f}s", file=out)
+    if summary["answers_per_second"] is not None:
+        print(f"throughput: {summary['answers_per_second']:.2f} answers/s, "
+              f"{summary['tokens_per_second']:.0f} tokens/s", file=out)
+    print(f"latency: {fmt(summary['latency'])}", file=out)
+    print(f"time to first token: {fmt(summary['ttft'])}", file=out)
+    if summary["errors"]:
+        print("errors: " + ", ".join(f"{name} x{count}" for name, count in sorted(summary["errors"].items())), file=out)
+    print(f"fake server: {summary['server']['requests']} API requests, "
+          f"{summary['server']['injected_errors']} injected errors", file=out)
+    for pid, rss in summary["peak_rss_mb"].items():
+        print(f"worker {pid}: peak RSS {rss:.1f} MB", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat sessions against a local fake API")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="questions per session")
+    parser.add_argument("--workers", type=int, default=1, help="processes the sessions are spread over")
+    parser.add_argument("--generation-workers", type=int, help="completions running at once per process")
+    parser.add_argument("--pdf-share", type=float, default=0.25, help="share of sessions that upload a PDF")
+    parser.add_argument("--pages", type=int, default=20, help="distinct web pages the URL sessions pick from")
+    parser.add_argument("--page-bytes", type=int, default=50_000)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=500)
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause before each question (s)")
+    parser.add_argument("--use-cache", action="store_true", help="read and write the response cache")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake API delay before the first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="fake API streaming rate (0 for no limit)")
+    parser.add_argument("--completion-tokens", type=int, default=100, help="fake API answer length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake API requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=float, help="Retry-After sent with injected errors (s)")
+    parser.add_argument("-o", "--output", help="also write the summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    report = run_load(
+        sessions=args.sessions,
+        turns=args.turns,
+        workers=args.workers,
+        pdf_share=args.pdf_share,
+        pages=args.pages,
+        page_bytes=args.page_bytes,
+        pdf_pages=args.pdf_pages,
+        max_tokens=args.max_tokens,
+        think_time=args.think_time,
+        use_cache=args.use_cache,
+        generation_workers=args.generation_workers,
+        server_options={
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second or None,
+            "completion_tokens": args.completion_tokens,
+            "error_rate": args.error_rate,
+            "error_status": args.error_status,
+            "retry_after": args.retry_after,
+        },
+    )
+    summary = summarize(report)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if not summary["errors"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
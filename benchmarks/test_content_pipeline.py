@@ -0,0 +1,67 @@
+import io
+import pytest
+from benchmarks.fixtures import HTML_SIZES, PDF_PAGES, html_page, page_text, page_url, pdf_document, rounds_for
+from src.utils.content_processor import truncate_text, extract_text_from_pdf, fetch_page_text
+from src.utils import upload_spool
+from src.utils.boilerplate import extract_main_text, get_boilerplate_registry
+from src.utils.retrieval import BM25Index
+from src.services.chat_service import prepare_request
+from src.services.api_service import DeepSeekAPI
+
+@pytest.mark.parametrize("size", HTML_SIZES)
+def test_extract_main_text(measure, benchmark, size):
+    """Main-content extraction; extra_info records tokens saved versus the page's full text"""
+    url = page_url(size)
+    measure(extract_main_text, html_page(size), url, rounds=rounds_for(size, 1_000_000))
+    savings = get_boilerplate_registry().savings(limit=1)[0]
+    assert savings["url"] == url
+    benchmark.extra_info["tokens_saved"] = savings["raw_tokens"] - savings["tokens"]
+
+@pytest.mark.parametrize("size", HTML_SIZES)
+def test_truncate_text(measure, size):
+    measure(truncate_text, page_text(size), rounds=rounds_for(size, 1_000_000))
+
+@pytest.mark.parametrize("size", HTML_SIZES)
+def test_fetch_page_text(measure, fake_openai, size):
+    """A scraped page end to end: fetch over the shared session, then extract its main text"""
+    fake_openai.pages[f"/page{size}.html"] = html_page(size)
+    measure(fetch_page_text, f"{fake_openai.base_url}/page{size}.html", rounds=rounds_for(size, 1_000_000))
+
+@pytest.mark.parametrize("pages", PDF_PAGES)
+def test_extract_pdf_truncated(measure, pages):
+    data = pdf_document(pages)
+    measure(lambda: extract_text_from_pdf(io.BytesIO(data)), rounds=rounds_for(pages, 100))
+
+@pytest.mark.parametrize("pages", PDF_PAGES)
+def test_extract_pdf_full(measure, pages):
+    data = pdf_document(pages)
+    measure(lambda: extract_text_from_pdf(io.BytesIO(data), max_length=None), rounds=rounds_for(pages, 100))
+
+@pytest.mark.parametrize("pages", PDF_PAGES)
+def test_spool_and_extract_pdf(measure, pages, tmp_path, monkeypatch):
+    """Upload path: spool to disk while hashing, then extract from the memory map"""
+    monkeypatch.setattr(upload_spool, "SPOOL_DIR", str(tmp_path))
+    data = pdf_document(pages)
+
+    def ingest():
+        spooled = upload_spool.spool_upload(io.BytesIO(data))
+        return extract_text_from_pdf(spooled.path, max_length=None)
+
+    measure(ingest, rounds=rounds_for(pages, 100))
+
+@pytest.mark.parametrize("size", HTML_SIZES)
+def test_build_index(measure, size):
+    measure(BM25Index.from_text, page_text(size), rounds=rounds_for(size, 1_000_000))
+
+@pytest.mark.parametrize("turns", [0, 20, 200])
+def test_prepare_request(measure, turns):
+    """Message-list construction for a question with a source and `turns` prior exchanges"""
+    api_service = DeepSeekAPI("benchmark", base_url="http://127.0.0.1:9")
+    index = BM25Index.from_text(page_text(1_000_000))
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Source: URL - https://example.com\nQuestion: question {turn} about the cache"})
+        history.append({"role": "assistant", "content": "An answer about the retrieval index and the cache. " * 20})
+    # Budgets large enough that no summarization call is made
+    state = {"history_token_budget": 10**9, "history_keep_turns": 10**6}
+    measure(prepare_request, api_service, "How does the cache work?", index, history, state)
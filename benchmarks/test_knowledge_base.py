@@ -0,0 +1,38 @@
+"""
+Knowledge base query and update latency on corpora of 10k and 100k chunks
+"""
+import itertools
+import pytest
+from benchmarks.fixtures import make_chunks
+from src.services.knowledge_base import KnowledgeBase
+
+KB_SIZES = [10_000, 100_000]
+SOURCE_CHUNKS = 1000
+
+_kb_cache = {}
+
+@pytest.fixture(params=KB_SIZES, ids=str)
+def knowledge_base(request, tmp_path_factory):
+    """A knowledge base of the given number of chunks, built once per size"""
+    size = request.param
+    if size not in _kb_cache:
+        kb = KnowledgeBase(str(tmp_path_factory.mktemp(f"kb{size}")))
+        chunks = make_chunks(size)
+        for start in range(0, size, SOURCE_CHUNKS):
+            kb.add_source(f"source{start // SOURCE_CHUNKS}", chunks[start:start + SOURCE_CHUNKS])
+        _kb_cache[size] = kb
+    return _kb_cache[size]
+
+def test_kb_search(measure, knowledge_base):
+    queries = itertools.cycle(make_chunks(50, words_per_chunk=8, seed=1))
+    measure(lambda: knowledge_base.search(next(queries), top_k=5), rounds=50)
+
+def test_kb_add_and_delete_source(measure, knowledge_base):
+    """Incremental update: embed and append one 100-chunk source, then remove it"""
+    chunks = make_chunks(100, seed=2)
+
+    def update():
+        knowledge_base.add_source("incremental", chunks)
+        knowledge_base.delete_source("incremental")
+
+    measure(update, rounds=10)
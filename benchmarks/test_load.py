@@ -0,0 +1,30 @@
+"""
+Smoke run of the load-test harness (python -m benchmarks.load_test for real runs)
+"""
+from benchmarks.load_test import run_load, summarize
+
+def test_load_sessions_are_answered():
+    summary = summarize(run_load(
+        sessions=8,
+        turns=2,
+        pdf_share=0.5,
+        pages=4,
+        pdf_pages=5,
+        server_options={"latency": 0.01, "completion_tokens": 20, "tokens_per_second": 200},
+    ))
+    assert summary["answered"] == summary["questions"] == 16
+    assert summary["latency"]["p95"] is not None
+    assert summary["ttft"]["p50"] <= summary["latency"]["p50"]
+    assert all(rss > 0 for rss in summary["peak_rss_mb"].values())
+
+def test_load_reports_injected_errors():
+    summary = summarize(run_load(
+        sessions=4,
+        turns=1,
+        pdf_share=0,
+        pages=2,
+        server_options={"error_rate": 1.0, "error_status": 400},
+    ))
+    assert summary["answered"] == 0
+    assert sum(summary["errors"].values()) == 4
+    assert summary["server"]["injected_errors"] == 4
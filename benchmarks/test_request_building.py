@@ -0,0 +1,31 @@
+"""
+End-to-end request benchmarks against the local fake OpenAI-compatible endpoint
+"""
+from benchmarks.fixtures import page_text
+from src.utils.retrieval import BM25Index
+from src.services.chat_service import prepare_request
+from src.services.api_service import DeepSeekAPI
+from src.services.generation_worker import GenerationJob
+
+def test_question_to_completion(measure, fake_openai):
+    api_service = DeepSeekAPI("benchmark", base_url=fake_openai.base_url)
+    index = BM25Index.from_text(page_text(100_000))
+
+    def ask():
+        request = prepare_request(api_service, "How does the cache work?", index, [], {})
+        return api_service.create_completion(request.messages).choices[0].message.content
+
+    measure(ask, rounds=20)
+
+def test_question_to_streamed_completion(measure, fake_openai):
+    api_service = DeepSeekAPI("benchmark", base_url=fake_openai.base_url)
+    index = BM25Index.from_text(page_text(100_000))
+
+    def ask():
+        request = prepare_request(api_service, "How does the cache work?", index, [], {})
+        job = GenerationJob("benchmark", api_service, request.messages)
+        job.run()
+        assert job.status == "done"
+        return job.text
+
+    measure(ask, rounds=20)
@@ -0,0 +1,64 @@
+"""
+Streamlit rerun overhead: what every widget interaction costs before any question is asked
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+import pytest
+from streamlit.testing.v1 import AppTest
+from benchmarks.fixtures import APP_PATH, isolate_stores
+
+ROOT = os.path.dirname(os.path.dirname(APP_PATH))
+
+# Mean time for one rerun of a session with a chat history, in milliseconds
+RERUN_TARGET_MS = float(os.getenv("RERUN_TARGET_MS", "100"))
+RERUN_ROUNDS = 20
+
+@pytest.fixture
+def isolated_stores(tmp_path, monkeypatch):
+    """Keep the conversation store and knowledge base the app opens out of the working tree"""
+    isolate_stores(str(tmp_path), monkeypatch)
+
+def make_app(history_turns=10):
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.session_state.api_key = "benchmark"
+    at.session_state.chat_history = [
+        {"role": role, "content": f"{role} message {i} " * 20}
+        for i in range(history_turns)
+        for role in ("user", "assistant")
+    ]
+    at.run()
+    assert not at.exception
+    return at
+
+def test_rerun_latency(benchmark, isolated_stores):
+    at = make_app()
+    durations = []
+
+    def rerun():
+        started = time.perf_counter()
+        at.run()
+        durations.append(time.perf_counter() - started)
+
+    benchmark.pedantic(rerun, rounds=RERUN_ROUNDS, iterations=1, warmup_rounds=2)
+    # Timed here, not read from benchmark.stats, which is empty under --benchmark-disable
+    while len(durations) < RERUN_ROUNDS:
+        rerun()
+    assert not at.exception
+    mean_ms = statistics.mean(durations[-RERUN_ROUNDS:]) * 1000
+    benchmark.extra_info["target_ms"] = RERUN_TARGET_MS
+    assert mean_ms < RERUN_TARGET_MS, f"rerun took {mean_ms:.0f} ms on average, target is {RERUN_TARGET_MS:.0f} ms"
+
+def test_ui_import_skips_parsers(benchmark):
+    """Importing the UI must not pull in the PDF and HTML parsers"""
+    code = (
+        "import sys; import src.components.chat_interface, src.components.sidebar; "
+        "sys.exit(1 if {'PyPDF2', 'bs4'} & set(sys.modules) else 0)"
+    )
+
+    def cold_import():
+        return subprocess.run([sys.executable, "-c", code], cwd=ROOT).returncode
+
+    assert benchmark.pedantic(cold_import, rounds=3, iterations=1) == 0
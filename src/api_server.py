@@ -0,0 +1,354 @@
+"""
+Headless HTTP API: the chatbot without the Streamlit UI, for other services and load balancers
+
+    python -m src.api_server --host 0.0.0.0 --port 8080 --workers 4
+
+POST /sources   Load and index a source and return its "source_id". Send JSON
+                {"url": ...} (URL, URL list or sitemap), or a multipart form
+                with the PDF in a "file" field.
+POST /chat      Answer {"question", "source_id"?, "url"?, "history"?, "settings"?,
+                "max_tokens"?, "use_cache"?, "stream"?}. With "stream": true the
+                answer comes as Server-Sent Events: "delta" events carrying
+                text, then a single "done" or "error" event.
+GET  /health    Liveness probe.
+GET  /metrics   Prometheus text for the worker process that answers.
+
+Every worker process has its own caches, scheduler and rate limiter, so the
+DEEPSEEK_RPM / DEEPSEEK_TPM quota is split evenly between workers. Source ids
+work on any worker: URLs are fetched again on a cache miss and PDFs are read
+back from the shared upload spool (until it evicts them; then /chat answers 404).
+The knowledge base ("use_knowledge_base") is shared by all workers. With more
+than one worker each process writes its own Prometheus file, METRICS_PROM_PATH
+with the pid before the extension, and GET /metrics covers only one worker.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv, find_dotenv
+
+# The src modules read their settings when imported, so .env goes first. Values
+# already in the environment win, including the per-worker quota set by main().
+load_dotenv(find_dotenv())
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from src.services.api_service import DeepSeekAPI, CircuitOpenError
+from src.services.chat_service import load_source, prepare_request, SourceError
+from src.services.generation_worker import GenerationJob, cancel_generation, start_generation
+from src.services.prompt_builder import PROMPT_LAYOUTS
+from src.services.response_cache import get_response_cache
+from src.services.telemetry import METRICS_PROM_PATH, RequestRecord, track_request, get_metrics_registry
+from src.utils.content_cache import url_cache_key, pdf_digest_cache_key
+from src.utils.upload_spool import SPOOL_DIR, SpooledFile, spool_upload, UploadTooLargeError
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+# How often a streaming response checks its generation job for new text
+STREAM_POLL_INTERVAL = float(os.getenv("API_STREAM_POLL_INTERVAL", "0.02"))
+MAX_COMPLETION_TOKENS = 8000
+# Per-request settings passed through to prepare_request; integers take the sidebar's ranges
+INT_SETTINGS = {
+    "retrieval_top_k": (1, 20),
+    "retrieval_token_budget": (500, 16000),
+    "history_token_budget": (500, 32000),
+    "history_keep_turns": (1, 20),
+}
+SETTINGS_KEYS = ("prompt_layout", *INT_SETTINGS, "use_knowledge_base")
+PDF_SOURCE_ID = re.compile(r"pdf:([0-9a-f]{64})$")
+
+class BadRequest(Exception):
+    """A request the API refuses; answered with `status` and the message"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def resolve_source(source_id):
+    """Index for a source id returned by POST /sources"""
+    if source_id.startswith("url:"):
+        return load_source(url=source_id[len("url:"):])
+    match = PDF_SOURCE_ID.match(source_id)
+    if match:
+        path = os.path.join(SPOOL_DIR, f"{match.group(1)}.pdf")
+        if os.path.exists(path):
+            return load_source(pdf_file=SpooledFile(path, match.group(1), os.path.getsize(path)))
+    raise BadRequest(f"Unknown source id: {source_id}", status=404)
+
+def parse_settings(settings):
+    """The known keys of a /chat "settings" object, checked against the values the UI allows"""
+    if not isinstance(settings, dict):
+        raise BadRequest('"settings" must be an object')
+    parsed = {key: settings[key] for key in SETTINGS_KEYS if key in settings}
+    if "prompt_layout" in parsed and parsed["prompt_layout"] not in PROMPT_LAYOUTS:
+        raise BadRequest(f'"settings.prompt_layout" must be one of: {", ".join(PROMPT_LAYOUTS)}')
+    for key, (low, high) in INT_SETTINGS.items():
+        value = parsed.get(key)
+        # bool is an int subclass, but true is not a chunk count
+        if key in parsed and (not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high):
+            raise BadRequest(f'"settings.{key}" must be an integer between {low} and {high}')
+    if "use_knowledge_base" in parsed and not isinstance(parsed["use_knowledge_base"], bool):
+        raise BadRequest('"settings.use_knowledge_base" must be true or false')
+    return parsed
+
+def parse_chat_request(body):
+    """Validated question, history, settings and completion options of a /chat body"""
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest('"question" is required')
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+        isinstance(msg, dict) and msg.get("role") in ("user", "assistant") and isinstance(msg.get("content"), str)
+        for msg in history
+    ):
+        raise BadRequest('"history" must be a list of {"role": "user" | "assistant", "content": ...}')
+    state = parse_settings(body.get("settings") or {})
+    max_tokens = body.get("max_tokens", 2000)
+    # Not coerced either: 2.7 or "5" is a client bug, not a token count
+    if not isinstance(max_tokens, int) or isinstance(max_tokens, bool):
+        raise BadRequest('"max_tokens" must be an integer')
+    if not 1 <= max_tokens <= MAX_COMPLETION_TOKENS:
+        raise BadRequest(f'"max_tokens" must be between 1 and {MAX_COMPLETION_TOKENS}')
+    for key in ("use_cache", "stream"):
+        # Checked rather than coerced: the string "false" is truthy
+        if key in body and not isinstance(body[key], bool):
+            raise BadRequest(f'"{key}" must be true or false')
+    return question, history, state, max_tokens
+
+def prepare_chat(api_service, body, question, history, state, max_tokens, record):
+    """Load the source and build the API request (blocking, so it runs in the thread pool)"""
+    with track_request(record):
+        index = None
+        if body.get("source_id"):
+            index = resolve_source(str(body["source_id"]))
+        elif body.get("url"):
+            index = load_source(url=str(body["url"]))
+        return prepare_request(api_service, question, index, history, state, max_tokens)
+
+def finish_chat(record, job=None, cache_key=None, aborted=False):
+    """Record a /chat request's metrics and cache a completed answer
+
+    `aborted` records a request whose client disconnected before the answer was sent.
+    """
+    if job is not None:
+        for stage, key in (("queue", "queue"), ("ttft", "ttft"), ("completion", "total")):
+            if key in job.timing:
+                record.add_span(stage, job.timing[key])
+        if job.status == "done" and cache_key:
+            get_response_cache().put(cache_key, job.text)
+        record.finish("aborted" if aborted else job.status, job.usage or None)
+    get_metrics_registry().record(record)
+
+def error_status(error):
+    """HTTP status for a failed completion"""
+    return 503 if isinstance(error, CircuitOpenError) else 502
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def client_id(request):
+    """Who the fair scheduler queues a request under: X-Client-Id, else the peer address"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else None)
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return body
+
+async def wait_for_job(job, request):
+    """Wait for a job to finish; returns False if the client disconnected first"""
+    while not job.finished:
+        if await request.is_disconnected():
+            return False
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+    return True
+
+async def answer_job(job, request, finish):
+    """JSON response for a job once it has finished; a client disconnect cancels the generation
+
+    `finish` runs however the wait ends, so aborted requests are recorded too.
+    """
+    connected = False
+    try:
+        connected = await wait_for_job(job, request)
+    finally:
+        if not job.finished:
+            cancel_generation(job)
+        if not connected:
+            finish(aborted=True)
+    if not connected:
+        # Nobody reads this; 499 is what proxies log for a client that went away
+        return JSONResponse({"error": "Client disconnected"}, status_code=499)
+    await run_in_threadpool(finish)
+    if job.status != "done":
+        return JSONResponse({"error": str(job.error or job.status)}, status_code=error_status(job.error))
+    return JSONResponse({"answer": job.text, "cached": False, "usage": job.usage or None, "timing": job.timing})
+
+async def stream_job(job, finish):
+    """SSE events for a running job; a client disconnect cancels the generation
+
+    `finish` runs however the stream ends, so aborted requests are recorded too.
+    """
+    sent = 0
+    finished_recorded = False
+    try:
+        while True:
+            # Check before reading parts so nothing appended at the end is missed
+            finished = job.finished
+            count = len(job.parts)
+            if count > sent:
+                yield sse("delta", {"text": "".join(job.parts[sent:count])})
+                sent = count
+            if finished:
+                break
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+        await run_in_threadpool(finish)
+        finished_recorded = True
+        if job.status == "done":
+            yield sse("done", {"cached": False, "usage": job.usage or None, "timing": job.timing})
+        else:
+            yield sse("error", {"error": str(job.error or job.status), "status": error_status(job.error)})
+    finally:
+        if not job.finished:
+            cancel_generation(job)
+        if not finished_recorded:
+            # The client went away; the generator is being closed, so no awaiting here
+            finish(aborted=True)
+
+async def stream_cached(answer):
+    yield sse("delta", {"text": answer})
+    yield sse("done", {"cached": True, "usage": None, "timing": {}})
+
+async def chat(request):
+    body = await read_json(request)
+    stream = bool(body.get("stream"))
+    use_cache = body.get("use_cache", True)
+    api_service = request.app.state.api_service
+    question, history, state, max_tokens = parse_chat_request(body)
+
+    record = RequestRecord("api")
+    try:
+        prepared = await run_in_threadpool(prepare_chat, api_service, body, question, history, state, max_tokens, record)
+    except (SourceError, BadRequest) as e:
+        # Unknown source ids (404) and unreadable sources count as requests too
+        record.finish("source_error" if isinstance(e, SourceError) else "bad_request")
+        await run_in_threadpool(finish_chat, record)
+        raise
+
+    if use_cache:
+        cached = await run_in_threadpool(get_response_cache().get, prepared.cache_key)
+        if cached:
+            record.finish("cached")
+            await run_in_threadpool(finish_chat, record)
+            if stream:
+                return StreamingResponse(stream_cached(cached), media_type="text/event-stream")
+            return JSONResponse({"answer": cached, "cached": True, "usage": None, "timing": {}})
+
+    job = GenerationJob(None, api_service, prepared.messages, max_tokens=max_tokens, summary=prepared.summary)
+    start_generation(job, client_id=client_id(request))
+
+    def finish(aborted=False):
+        finish_chat(record, job, prepared.cache_key if use_cache else None, aborted)
+
+    if stream:
+        return StreamingResponse(
+            stream_job(job, finish),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    return await answer_job(job, request, finish)
+
+async def sources(request):
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form() as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise BadRequest('Expected the PDF in a "file" field')
+            spooled = await run_in_threadpool(spool_upload, upload.file)
+        source_id = pdf_digest_cache_key(spooled.sha256)
+        index = await run_in_threadpool(load_source, pdf_file=spooled)
+    else:
+        body = await read_json(request)
+        url = body.get("url")
+        if not isinstance(url, str) or not url.strip():
+            raise BadRequest('Expected {"url": ...} or a multipart PDF upload')
+        source_id = url_cache_key(url)
+        index = await run_in_threadpool(load_source, url=url)
+    return JSONResponse({"source_id": source_id, "chunks": len(index.chunks)})
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+async def metrics(request):
+    text = await run_in_threadpool(get_metrics_registry().prometheus_text)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+async def bad_request(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=exc.status)
+
+async def source_error(request, exc):
+    return JSONResponse({"error": f"Failed to process content: {exc}"}, status_code=422)
+
+async def upload_too_large(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=413)
+
+@asynccontextmanager
+async def lifespan(app):
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        raise RuntimeError("DEEPSEEK_API_KEY is not set")
+    app.state.api_service = DeepSeekAPI(api_key, base_url=os.getenv("DEEPSEEK_BASE_URL", DEFAULT_BASE_URL))
+    yield
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/sources", sources, methods=["POST"]),
+        Route("/health", health),
+        Route("/metrics", metrics),
+    ],
+    exception_handlers={
+        BadRequest: bad_request,
+        SourceError: source_error,
+        UploadTooLargeError: upload_too_large,
+    },
+    lifespan=lifespan,
+)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the chatbot over HTTP (JSON and Server-Sent Events)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--base-url", help=f"API endpoint (default: $DEEPSEEK_BASE_URL or {DEFAULT_BASE_URL})")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("DEEPSEEK_API_KEY"):
+        parser.error("DEEPSEEK_API_KEY is not set")
+    if args.base_url:
+        os.environ["DEEPSEEK_BASE_URL"] = args.base_url
+    if args.workers > 1:
+        # Each worker process has its own limiter, so it gets a share of the key's quota
+        for name in ("DEEPSEEK_RPM", "DEEPSEEK_TPM"):
+            if float(os.getenv(name) or 0):
+                os.environ[name] = str(float(os.environ[name]) / args.workers)
+        if METRICS_PROM_PATH and "{pid}" not in METRICS_PROM_PATH:
+            # Each worker has its own registry, so one shared file would only show the last writer
+            root, ext = os.path.splitext(METRICS_PROM_PATH)
+            os.environ["METRICS_PROM_PATH"] = f"{root}.{{pid}}{ext}"
+
+    uvicorn.run("src.api_server:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,30 @@
 import streamlit as st
 import os
+import sys
 from dotenv import load_dotenv, find_dotenv
+
+@st.cache_resource
+def load_env_api_key():
+    """Load .env once per process and return the DeepSeek API key from it
+
+    Changes to .env take effect after restarting the app.
+    """
+    dotenv_path = find_dotenv()
+    load_dotenv(dotenv_path, override=True)
+    return os.getenv("DEEPSEEK_API_KEY")
+
+# The src modules read their settings when imported, so .env goes first
+env_api_key = load_env_api_key()
+
+# `streamlit run src/app.py` puts src/ on the path, not the repo root the imports start from
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
 from src.components.sidebar import render_sidebar
-from src.components.chat_interface import display_chat_history, render_input_area
+from src.components.chat_interface import display_chat_history, render_input_area, load_conversation
 from src.services.api_service import DeepSeekAPI
+from src.services.telemetry import start_metrics_server
 
 # Page configuration
 st.set_page_config(
@@ -12,23 +33,25 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load CSS
-css_path = os.path.join(os.path.dirname(__file__), 'styles', 'main.css')
-with open(css_path) as f:
-    st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+@st.cache_resource
+def load_css():
+    """Stylesheet contents, read once per process"""
+    css_path = os.path.join(os.path.dirname(__file__), 'styles', 'main.css')
+    with open(css_path) as f:
+        return f.read()
+
+# Load CSS (the element itself must be re-sent on every rerun)
+st.markdown(f'<style>{load_css()}</style>', unsafe_allow_html=True)
 
 # Initialize session state
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'content_cache' not in st.session_state:
-    st.session_state.content_cache = {}
+load_conversation()
 if 'api_key' not in st.session_state:
     st.session_state.api_key = None
 
-# Load environment variables
-dotenv_path = find_dotenv()
-load_dotenv(dotenv_path, override=True)
-st.session_state.env_api_key = os.getenv("DEEPSEEK_API_KEY")
+st.session_state.env_api_key = env_api_key
+
+# Expose Prometheus metrics if METRICS_PORT is set (once per process)
+start_metrics_server()
 
 # Render sidebar
 render_sidebar()
@@ -38,7 +61,7 @@ if not st.session_state.api_key:
     st.warning("Please provide a DeepSeek API key in the sidebar to use the app.")
     st.stop()
 
-# Initialize API service
+# Initialize API service (cheap: the underlying OpenAI client is shared per key)
 api_service = DeepSeekAPI(st.session_state.api_key)
 
 # Display chat interface
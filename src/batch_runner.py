@@ -0,0 +1,183 @@
+"""
+Headless batch runner: answer a JSONL file of {source, question} records
+
+    python -m src.batch_runner questions.jsonl -o answers.jsonl --concurrency 8 --rpm 60 --tpm 200000
+
+Each input line is a JSON object with a "question" and optionally an "id", a
+"source" (URL, URL list, sitemap or path to a PDF) and a "history" list of
+{role, content} messages. Answers are appended to the output file as they
+complete; re-running with the same output skips records that already succeeded.
+Records that failed are retried and get another line, so the last line for an
+id is its current result. A record without a question gets an error line.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv, find_dotenv
+
+# The src modules read their settings when imported, so .env goes first
+load_dotenv(find_dotenv(), override=True)
+
+from src.services.api_service import DeepSeekAPI
+from src.services.chat_service import load_source, prepare_request, SourceError
+from src.services.generation_worker import GenerationJob
+from src.services.rate_limiter import RateLimiter
+from src.services.scheduler import FairScheduler
+from src.services.response_cache import get_response_cache
+from src.services.telemetry import RequestRecord, track_request, get_metrics_registry
+from src.utils.stats import summarize_latencies
+
+def read_records(path):
+    """Input records with a stable id (given, or the line number)"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                if not isinstance(record, dict):
+                    # Answered with an error line instead of stopping the run
+                    record = {}
+                record.setdefault("id", str(line_number))
+                yield record
+
+def completed_ids(path):
+    """Ids of records that already have a successful answer in the output file"""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+def load_record_source(source):
+    if not source:
+        return None
+    if source.lower().endswith(".pdf") and os.path.exists(source):
+        return load_source(pdf_file=source)
+    return load_source(url=source)
+
+def answer_record(record, api_service, scheduler, settings, use_cache, max_tokens):
+    """Answer one record; always returns a result dict, never raises
+
+    The completion goes through `scheduler`, so it waits for the run's rate
+    limits and for any pause after a 429, like answers in the app.
+    """
+    result = {"id": record.get("id"), "source": record.get("source"), "question": record.get("question")}
+    started = time.perf_counter()
+    metrics = RequestRecord("batch")
+    job = None
+    try:
+        if not isinstance(result["question"], str) or not result["question"].strip():
+            raise ValueError('record has no "question"')
+        with track_request(metrics):
+            index = load_record_source(record.get("source"))
+            state = dict(settings)
+            request = prepare_request(api_service, record["question"], index, record.get("history", []), state, max_tokens)
+
+        if use_cache:
+            cached = get_response_cache().get(request.cache_key)
+            if cached:
+                result.update(status="ok", answer=cached, cached=True, latency=time.perf_counter() - started)
+                return result
+
+        job = GenerationJob(record["id"], api_service, request.messages, max_tokens=max_tokens, summary=request.summary)
+        scheduler.submit(job)
+        job.wait()
+
+        if job.status != "done":
+            raise job.error or RuntimeError(job.status)
+        if use_cache:
+            get_response_cache().put(request.cache_key, job.text)
+        result.update(
+            status="ok",
+            answer=job.text,
+            latency=time.perf_counter() - started,
+            ttft=job.timing.get("ttft"),
+            usage=job.usage or None
+        )
+    except SourceError as e:
+        result.update(status="error", error=f"Failed to process content: {e}", latency=time.perf_counter() - started)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}", latency=time.perf_counter() - started)
+    finally:
+        if job is not None:
+            for stage, key in (("ttft", "ttft"), ("completion", "total")):
+                if key in job.timing:
+                    metrics.add_span(stage, job.timing[key])
+        metrics.finish("cached" if result.get("cached") else result.get("status", "error"), job.usage if job else None)
+        get_metrics_registry().record(metrics)
+    return result
+
+def print_report(results, elapsed, out=None):
+    out = out or sys.stderr
+    ok = [r for r in results if r["status"] == "ok"]
+    tokens = sum((r.get("usage") or {}).get("total_tokens") or 0 for r in ok)
+    latency = summarize_latencies([r["latency"] for r in ok])
+    ttft = summarize_latencies([r["ttft"] for r in ok if r.get("ttft") is not None])
+
+    def fmt(summary):
+        return " ".join(f"{k}={v:.2f}s" if v is not None else f"{k}=n/a" for k, v in summary.items())
+
+    print(f"{len(ok)}/{len(results)} records answered in {elapsed:.1f}s", file=out)
+    if elapsed > 0:
+        print(f"throughput: {len(ok) / elapsed:.2f} records/s, {tokens / elapsed:.0f} tokens/s", file=out)
+    print(f"latency: {fmt(latency)}", file=out)
+    print(f"time to first token: {fmt(ttft)}", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against their sources")
+    parser.add_argument("input", help="JSONL file of {id?, source?, question, history?} records")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file answers are appended to")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=60, help="requests per minute (0 for no limit)")
+    parser.add_argument("--tpm", type=float, default=0, help="tokens per minute (0 for no limit)")
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--layout", default="retrieval", choices=["retrieval", "stable_prefix"])
+    parser.add_argument("--use-cache", action="store_true", help="read and write the response cache")
+    parser.add_argument("--base-url", default="https://api.deepseek.com")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        parser.error("DEEPSEEK_API_KEY is not set")
+
+    api_service = DeepSeekAPI(api_key, base_url=args.base_url)
+    # Reserves the prompt plus the full completion per job and refunds what was not used
+    scheduler = FairScheduler(RateLimiter(args.rpm or None, args.tpm or None), max_workers=args.concurrency)
+    settings = {"prompt_layout": args.layout}
+
+    done = completed_ids(args.output)
+    pending = [r for r in read_records(args.input) if r["id"] not in done]
+    print(f"{len(pending)} records to answer ({len(done)} already done)", file=sys.stderr)
+
+    results = []
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+    with open(args.output, "a") as out, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        def run(record):
+            result = answer_record(record, api_service, scheduler, settings, args.use_cache, args.max_tokens)
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                results.append(result)
+
+        for _ in pool.map(run, pending):
+            pass
+
+    print_report(results, time.perf_counter() - started)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,76 @@
 import streamlit as st
-from src.utils.content_processor import scrape_website, extract_text_from_pdf
+from src.services.chat_service import load_source, prefetch_source, await_prefetch, prepare_request, save_to_knowledge_base, SourceError
+from src.services.response_cache import get_response_cache
+from src.services.generation_worker import GenerationJob, cancel_generation, start_generation
+from src.services.scheduler import get_scheduler
+from src.services.api_service import CircuitOpenError
+from src.services.telemetry import RequestRecord, track_request, get_metrics_registry, span
+from src.services.conversation_store import get_conversation_store
+from src.services.knowledge_base import get_knowledge_base
+from src.services.history_manager import drop_summarized
+from src.utils.upload_spool import MAX_UPLOAD_BYTES
+from src.utils.content_processor import PDF_MAX_PAGES
+import os
+import time
+
+GENERATION_POLL_INTERVAL = 0.1
+# Messages rendered per page of chat history; older ones load on demand
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+# Messages kept in session state; older ones stay in the conversation store
+CONVERSATION_MEMORY_MESSAGES = int(os.getenv("CONVERSATION_MEMORY_MESSAGES", "40"))
+# How stale the sidebar's knowledge base counts may get before they are re-read
+KB_OVERVIEW_TTL = int(os.getenv("KB_OVERVIEW_TTL", "30"))
+
+@st.cache_data(ttl=KB_OVERVIEW_TTL, show_spinner=False)
+def knowledge_base_overview():
+    """Knowledge base stats and sources for the sidebar, shared by all sessions
+
+    Cached so the SQLite queries do not run on every rerun; changes made here
+    clear it, changes from other processes show up within KB_OVERVIEW_TTL.
+    """
+    kb = get_knowledge_base()
+    return kb.stats(), kb.sources()
+
+def load_conversation():
+    """Attach the session to the conversation in the URL, or start a new one
+
+    The conversation id is kept in the ?conversation= query parameter so a page
+    reload (or a server restart) picks the conversation back up. Only the most
+    recent messages are loaded into session state.
+    """
+    if "conversation_id" in st.session_state:
+        return
+    conversation_id = st.query_params.get("conversation")
+    if conversation_id:
+        history = get_conversation_store().recent(conversation_id, CONVERSATION_MEMORY_MESSAGES)
+        # Start on a user message so history stays aligned on exchanges
+        if history and history[0]["role"] != "user":
+            history = history[1:]
+        st.session_state.chat_history = history
+    else:
+        conversation_id = get_conversation_store().new_conversation_id()
+        st.session_state.setdefault("chat_history", [])
+    st.session_state.conversation_id = conversation_id
+    st.query_params["conversation"] = conversation_id
+
+def new_conversation():
+    """Start an empty conversation; the old one stays in the store"""
+    job = st.session_state.get("generation_job")
+    if job is not None:
+        # Its question goes with the old history, so there is nothing to commit it to
+        cancel_generation(job)
+        st.session_state.generation_job = None
+    conversation_id = get_conversation_store().new_conversation_id()
+    st.session_state.conversation_id = conversation_id
+    st.session_state.chat_history = []
+    st.session_state.history_summary = None
+    st.session_state.pop("history_shown", None)
+    st.query_params["conversation"] = conversation_id
+
+def save_exchange(user_message, assistant_message):
+    """Append a settled exchange to the store and bound the in-memory history"""
+    get_conversation_store().append(st.session_state.conversation_id, [user_message, assistant_message])
+    drop_summarized(st.session_state.chat_history, st.session_state, CONVERSATION_MEMORY_MESSAGES)
 
 def display_chat_history():
     """Display the chat history in the main container"""
@@ -7,11 +78,87 @@ def display_chat_history():
     chat_container = st.container()
 
     with chat_container:
-        for message in st.session_state.chat_history:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+        render_history_window()
     st.markdown('</div>', unsafe_allow_html=True)
 
+def show_older_messages():
+    st.session_state.history_shown = st.session_state.get("history_shown", CHAT_HISTORY_WINDOW) + CHAT_HISTORY_WINDOW
+
+@st.fragment
+def render_history_window():
+    """Render the most recent messages, with a button to load older ones
+
+    Only the window is re-sent on each rerun, so rerun cost does not grow with
+    the length of the conversation. As a fragment, loading older messages
+    reruns just this part of the page. The messages themselves are not put
+    in st.cache_data: replaying a cached element builds the same protobuf
+    again and adds hashing the message text, which made reruns slower.
+    """
+    history = st.session_state.chat_history
+    shown = st.session_state.get("history_shown", CHAT_HISTORY_WINDOW)
+    start = max(0, len(history) - shown)
+    visible = history[start:]
+    hidden = start
+
+    # Messages older than session state holds are paged in from the store
+    oldest_id = history[0].get("id") if history else None
+    if oldest_id is not None:
+        # Messages before a stored id never change, so the page is read once, not on every rerun
+        page_key = (st.session_state.conversation_id, oldest_id, shown)
+        page = st.session_state.get("history_page")
+        if page is None or page[0] != page_key:
+            store = get_conversation_store()
+            conversation_id = st.session_state.conversation_id
+            older = store.recent(conversation_id, shown - len(history), before_id=oldest_id) if shown > len(history) else []
+            count = store.count(conversation_id, before_id=older[0]["id"] if older else oldest_id)
+            page = st.session_state.history_page = (page_key, older, count)
+        _, older, count = page
+        visible = older + visible
+        hidden += count
+
+    if hidden:
+        st.button(
+            f"Show {min(hidden, CHAT_HISTORY_WINDOW)} older messages ({hidden} hidden)",
+            key="load_older_messages",
+            on_click=show_older_messages
+        )
+
+    for message in visible:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if message.get("cached"):
+                st.caption("⚡ Cached answer")
+            elif message.get("cancelled"):
+                st.caption("Generation stopped.")
+
+def source_key(url, uploaded_file):
+    """Which source a question about `url` / `uploaded_file` loads (the URL wins, as in load_source)"""
+    if url:
+        return ("url", url)
+    if uploaded_file is not None:
+        return ("pdf", uploaded_file.file_id)
+    return None
+
+def prefetch_url():
+    """Start fetching and indexing the URL as soon as it is entered"""
+    url = st.session_state.get("url_input")
+    if url:
+        st.session_state.source_prefetch = (source_key(url, None), prefetch_source(url=url))
+
+def prefetch_upload():
+    """Start spooling and parsing an uploaded PDF while the question is typed"""
+    uploaded_file = st.session_state.get("pdf_upload")
+    if uploaded_file is not None and not st.session_state.get("url_input"):
+        st.session_state.source_prefetch = (source_key(None, uploaded_file), prefetch_source(pdf_file=uploaded_file))
+
+def await_source(url, uploaded_file):
+    """Index for the question's source, reusing a prefetch that is running or done"""
+    prefetch = st.session_state.get("source_prefetch")
+    if prefetch is not None and prefetch[0] == source_key(url, uploaded_file):
+        with span("source_load"):
+            return await_prefetch(prefetch[1], url=url, pdf_file=uploaded_file)
+    return load_source(url=url, pdf_file=uploaded_file)
+
 def render_input_area(api_service):
     """Render the input area for URL, PDF, and questions"""
     with st.container():
@@ -19,15 +166,52 @@ def render_input_area(api_service):
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            url = st.text_input("Enter website URL (optional):", key="url_input", placeholder="https://example.com")
+            url = st.text_input(
+                "Enter website URL(s) or sitemap.xml (optional):",
+                key="url_input",
+                on_change=prefetch_url,
+                placeholder="https://example.com",
+                help="Separate several URLs with spaces or commas; a sitemap pulls in every page it lists"
+            )
         
         with col2:
-            uploaded_file = st.file_uploader("Upload PDF (optional)", type="pdf", label_visibility="collapsed")
+            uploaded_file = st.file_uploader(
+                "Upload PDF (optional)",
+                type="pdf",
+                key="pdf_upload",
+                on_change=prefetch_upload,
+                label_visibility="collapsed",
+                help=f"Up to {MAX_UPLOAD_BYTES // 2**20} MB; only the first {PDF_MAX_PAGES} pages are read"
+            )
         
         question = st.text_input("Enter your question:", key="question_input", placeholder="Ask me anything...")
+        st.checkbox(
+            "Use cached answers",
+            value=True,
+            key="use_response_cache",
+            help="Reuse an earlier answer to the same question about the same source"
+        )
+        kb_col1, kb_col2 = st.columns(2)
+        with kb_col1:
+            st.checkbox(
+                "Search knowledge base",
+                value=False,
+                key="use_knowledge_base",
+                help="Also retrieve from every source saved to the knowledge base"
+            )
+        with kb_col2:
+            st.checkbox(
+                "Save source to knowledge base",
+                value=False,
+                key="save_to_knowledge_base",
+                help="Keep the URL or PDF in the knowledge base for later questions"
+            )
         
         if st.button("Get Answer", key="submit"):
             process_user_input(question, url, uploaded_file, api_service)
+        elif st.session_state.get("generation_job"):
+            # A rerun while an answer is still being generated: re-attach to it
+            render_generation(st.session_state.generation_job)
         
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -36,6 +220,15 @@ def process_user_input(question, url, uploaded_file, api_service):
     if not question:
         st.warning("Please enter a question.")
         return
+
+    # Coalesce repeated clicks instead of starting another completion
+    fingerprint = (question, url, uploaded_file.name if uploaded_file else None)
+    job = st.session_state.get("generation_job")
+    if job is not None:
+        if job.fingerprint != fingerprint:
+            st.info("Still answering the previous question. Wait for it or stop it first.")
+        render_generation(job)
+        return
         
     # Add user's question to chat history
     if url or uploaded_file:
@@ -55,64 +248,176 @@ def process_user_input(question, url, uploaded_file, api_service):
     with st.chat_message("user"):
         st.markdown(user_message["content"])
 
-    with st.spinner("Generating response..."):
-        content = None
+    record = RequestRecord()
+    with st.spinner("Generating response..."), track_request(record):
+        index = None
         # Get content from URL or PDF if provided
         if url or uploaded_file:
-            source_id = url if url else uploaded_file.name
-            if source_id not in st.session_state.content_cache:
-                if url:
-                    content = scrape_website(url)
-                else:
-                    content = extract_text_from_pdf(uploaded_file)
-                    
-                if isinstance(content, str) and not content.startswith("Error"):
-                    st.session_state.content_cache[source_id] = content
-                else:
-                    st.error(f"Failed to process content: {content}")
-                    st.session_state.chat_history.pop()
-                    return
-            
-            content = st.session_state.content_cache.get(source_id)
-            if not content:
-                st.error("Failed to retrieve content.")
+            try:
+                index = await_source(url, uploaded_file)
+            except SourceError as e:
+                record.finish("source_error")
+                get_metrics_registry().record(record)
+                st.error(f"Failed to process content: {e}")
                 st.session_state.chat_history.pop()
                 return
+            if st.session_state.get("save_to_knowledge_base"):
+                added = save_to_knowledge_base(url or uploaded_file.name, index)
+                if added:
+                    knowledge_base_overview.clear()
+                    st.caption(f"Saved {added} chunks to the knowledge base")
+
+        request = prepare_request(
+            api_service,
+            question,
+            index,
+            st.session_state.chat_history[:-1],
+            st.session_state
+        )
+        if index is not None:
+            st.caption(f"Using ~{request.context_tokens} of ~{index.total_tokens} source tokens ({len(index.chunks)} chunks indexed)")
+        elif request.context_tokens:
+            st.caption(f"Using ~{request.context_tokens} tokens from the knowledge base")
         
-        # Prepare messages for the API
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant. If content is provided, base your answers on that content. Otherwise, provide helpful and informative responses based on your general knowledge."}
-        ]
-        
-        # Add formatted chat history for context
-        for msg in st.session_state.chat_history[:-1]:
-            messages.append(api_service.format_message_for_api(msg))
-        
-        # Add the current question with context if available
-        if content:
-            messages.append({
-                "role": "user",
-                "content": f"Based on this content: {content}\n\nPlease answer: {question}"
-            })
+        # Answer repeated questions about the same source from the response cache
+        use_cache = st.session_state.get("use_response_cache", True)
+        if use_cache:
+            started = time.perf_counter()
+            cached_response = get_response_cache().get(request.cache_key)
+            if cached_response:
+                record.finish("cached")
+                get_metrics_registry().record(record)
+                assistant_message = {
+                    "role": "assistant",
+                    "content": cached_response,
+                    "cached": True
+                }
+                st.session_state.chat_history.append(assistant_message)
+                save_exchange(user_message, assistant_message)
+                with st.chat_message("assistant"):
+                    st.markdown(cached_response)
+                    st.caption(f"⚡ Cached answer · {(time.perf_counter() - started) * 1000:.0f} ms")
+                return
+
+        # Generate in the background so the session stays responsive and can cancel
+        job = GenerationJob(
+            fingerprint,
+            api_service,
+            request.messages,
+            meta={
+                "cache_key": request.cache_key,
+                "use_cache": use_cache,
+                "record": record,
+                "conversation_id": st.session_state.conversation_id
+            },
+            summary=request.summary
+        )
+        st.session_state.generation_job = start_generation(job, client_id=st.session_state.conversation_id)
+
+    render_generation(job)
+
+def render_generation(job):
+    """Show a background answer; once it has finished, commit it to chat history
+
+    While the job runs, a fragment polls it every GENERATION_POLL_INTERVAL
+    instead of the script thread sleeping in a loop, so the script run ends
+    right away and Stop is an ordinary button click.
+    """
+    if not job.finished:
+        render_generation_progress(job)
+        return
+
+    with st.chat_message("assistant"):
+        st.markdown(job.text)
+        if job.status == "done":
+            render_response_timing(job.timing)
+            render_prompt_cache_usage(job.usage)
+        elif job.status == "cancelled":
+            st.caption("Generation stopped.")
+
+    commit_generation(job)
+    if job.status == "failed":
+        if isinstance(job.error, CircuitOpenError):
+            st.error(str(job.error))
         else:
-            messages.append({
-                "role": "user",
-                "content": question
-            })
-        
-        # Make API call with error handling
-        response_content = api_service.make_api_call(messages)
-        
-        if response_content:
-            # Add assistant's response to chat history
-            assistant_message = {
-                "role": "assistant",
-                "content": response_content
-            }
-            st.session_state.chat_history.append(assistant_message)
-            
-            # Display the response
-            with st.chat_message("assistant"):
-                st.markdown(assistant_message["content"])
+            job.api_service.report_error(job.error)
+
+@st.fragment(run_every=GENERATION_POLL_INTERVAL)
+def render_generation_progress(job):
+    """Streaming view of a running job; reruns the app once the job has finished"""
+    if st.session_state.get("generation_job") is not job:
+        return
+    if job.finished:
+        st.rerun()
+    with st.chat_message("assistant"):
+        queued = get_scheduler().position(job) if job.status == "queued" else None
+        if queued:
+            st.caption(f"Queued · position {queued[0]} of {queued[1]}")
         else:
-            st.session_state.chat_history.pop() 
\ No newline at end of file
+            st.markdown(job.text + "▌")
+        st.button("Stop generating", key="cancel_generation", on_click=cancel_generation, args=(job,))
+
+def commit_generation(job):
+    """Move a finished job's answer into chat history (no UI calls, so a rerun can't split it)
+
+    A failed job's partial text is dropped along with its question rather than
+    kept as an answer that later prompts would build on. A job started in a
+    conversation that has since been cleared is dropped without touching history.
+    """
+    st.session_state.generation_job = None
+    record_generation_metrics(job)
+    if job.meta.get("conversation_id") != st.session_state.conversation_id:
+        return
+    if job.summary is not None:
+        # Before save_exchange, which drops messages the summary covers
+        job.summary.commit(st.session_state)
+    response_content = job.text
+    if response_content and job.status != "failed":
+        # Add assistant's response to chat history
+        assistant_message = {
+            "role": "assistant",
+            "content": response_content
+        }
+        if job.status == "cancelled":
+            assistant_message["cancelled"] = True
+        st.session_state.chat_history.append(assistant_message)
+        save_exchange(st.session_state.chat_history[-2], assistant_message)
+        if job.status == "done":
+            record_prompt_cache_usage(job.usage)
+            if job.meta.get("use_cache"):
+                get_response_cache().put(job.meta["cache_key"], response_content)
+    else:
+        st.session_state.chat_history.pop()
+
+def record_generation_metrics(job):
+    """Add the job's queue, first-token and completion times to its request record"""
+    record = job.meta.get("record")
+    if record is None:
+        return
+    for stage, key in (("queue", "queue"), ("ttft", "ttft"), ("completion", "total")):
+        if key in job.timing:
+            record.add_span(stage, job.timing[key])
+    record.finish(job.status, job.usage)
+    get_metrics_registry().record(record)
+
+def record_prompt_cache_usage(usage):
+    """Add the provider's prompt cache hit/miss token counts to the session totals"""
+    if not usage or usage.get("prompt_cache_hit_tokens") is None:
+        return
+    stats = st.session_state.setdefault("prompt_cache_stats", {"hit": 0, "miss": 0})
+    stats["hit"] += usage["prompt_cache_hit_tokens"]
+    stats["miss"] += usage.get("prompt_cache_miss_tokens") or 0
+
+def render_prompt_cache_usage(usage):
+    """Show how much of the prompt the provider served from its cache"""
+    if not usage or usage.get("prompt_cache_hit_tokens") is None:
+        return
+    st.caption(
+        f"Prompt cache: {usage['prompt_cache_hit_tokens']} of "
+        f"{usage['prompt_cache_hit_tokens'] + (usage.get('prompt_cache_miss_tokens') or 0)} prompt tokens served from cache"
+    )
+
+def render_response_timing(timing):
+    """Show time-to-first-token and total generation time under a response"""
+    if "ttft" in timing:
+        st.caption(f"First token after {timing['ttft']:.2f}s · completed in {timing['total']:.2f}s")
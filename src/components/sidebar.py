@@ -1,5 +1,26 @@
 import streamlit as st
+import functools
 import time
+from src.utils.retrieval import DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from src.utils.content_cache import get_content_cache
+from src.utils.single_flight import get_source_flights
+from src.services.http_client import recent_fetches
+from src.services.history_manager import HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS
+from src.services.api_service import resilience_stats
+from src.services.scheduler import get_scheduler
+from src.services.telemetry import get_metrics_registry
+from src.services.conversation_store import get_conversation_store
+from src.services.knowledge_base import get_knowledge_base
+from src.utils.boilerplate import get_boilerplate_registry
+from src.components.chat_interface import new_conversation, knowledge_base_overview
+from src.services.prompt_builder import PROMPT_LAYOUTS, DEFAULT_PROMPT_LAYOUT, prompt_cache_ratio
+
+def export_transcript(conversation_id):
+    """Plain-text transcript of a stored conversation, read from the store in batches"""
+    return "\n\n".join(
+        f"{msg['role'].upper()}: {msg['content']}"
+        for msg in get_conversation_store().iter_messages(conversation_id)
+    )
 
 def render_sidebar():
     """Render the sidebar with API key management and controls"""
@@ -32,21 +53,152 @@ def render_sidebar():
             st.success("API key loaded from environment!")
             st.session_state.api_key = env_api_key
         
+        st.markdown("---")
+        st.markdown("### Source Retrieval")
+        st.radio(
+            "Prompt layout",
+            options=list(PROMPT_LAYOUTS),
+            index=list(PROMPT_LAYOUTS).index(DEFAULT_PROMPT_LAYOUT),
+            format_func=PROMPT_LAYOUTS.get,
+            key="prompt_layout",
+            help="A stable prefix sends the whole document first on every turn so DeepSeek's context cache can reuse it"
+        )
+        st.number_input(
+            "Chunks per question",
+            min_value=1,
+            max_value=20,
+            value=DEFAULT_TOP_K,
+            key="retrieval_top_k",
+            help="How many of the most relevant document chunks to send with each question"
+        )
+        st.number_input(
+            "Context token budget",
+            min_value=500,
+            max_value=16000,
+            value=DEFAULT_TOKEN_BUDGET,
+            step=500,
+            key="retrieval_token_budget",
+            help="Upper bound on source tokens sent with each question"
+        )
+        st.markdown("### Conversation Memory")
+        st.number_input(
+            "History token budget",
+            min_value=500,
+            max_value=32000,
+            value=HISTORY_TOKEN_BUDGET,
+            step=500,
+            key="history_token_budget",
+            help="Older turns are folded into a running summary to stay under this budget"
+        )
+        st.number_input(
+            "Recent turns kept verbatim",
+            min_value=1,
+            max_value=20,
+            value=HISTORY_KEEP_TURNS,
+            key="history_keep_turns"
+        )
+
+        ratio = prompt_cache_ratio(st.session_state.get("prompt_cache_stats", {}))
+        if ratio is not None:
+            st.caption(f"Provider prompt cache hit ratio this session: {ratio:.0%}")
+
+        with st.expander("Latency by stage"):
+            summary = get_metrics_registry().stage_summary()
+            if not summary:
+                st.caption("No requests yet.")
+            else:
+                st.table([
+                    {
+                        "stage": stage,
+                        "n": values["count"],
+                        "p50 ms": round(values["p50"] * 1000),
+                        "p95 ms": round(values["p95"] * 1000),
+                        "p99 ms": round(values["p99"] * 1000),
+                    }
+                    for stage, values in summary.items()
+                ])
+
+        with st.expander("API health"):
+            api = resilience_stats()
+            states = ", ".join(api["breakers"].values()) or "closed"
+            st.caption(
+                f"Circuit: {states} · opened {api['times_opened']}x · {api['short_circuited']} calls short-circuited\n\n"
+                f"{api['calls']} calls · {api['retries']} retries · {api['failures']} failed after retries · "
+                f"{api['deadline_exceeded']} hit the deadline"
+            )
+            queue = get_scheduler().stats()
+            limits = " · ".join(
+                f"{name} {left:.0f}/{capacity:.0f} left" for name, (left, capacity) in queue["limits"].items()
+            ) or "no rate limit configured"
+            st.caption(
+                f"Queue: {queue['queued']} waiting from {queue['clients']} sessions · {queue['running']} running · "
+                f"{queue['rate_limited']} rate-limited responses"
+                + (f" · paused {queue['paused_for']:.0f}s" if queue["paused_for"] else "")
+                + f"\n\nPer-minute budget: {limits}"
+            )
+
+        with st.expander("Knowledge base"):
+            stats, sources = knowledge_base_overview()
+            st.caption(
+                f"{stats['sources']} sources · {stats['chunks']} chunks · "
+                f"{stats['bytes'] / 2**20:.1f} MB of vectors ({stats['dead_rows']} deleted rows)"
+            )
+            for name, chunk_count, _ in sources:
+                col1, col2 = st.columns([4, 1])
+                col1.caption(f"{name} · {chunk_count} chunks")
+                if col2.button("✕", key=f"kb_delete_{name}", help="Remove from the knowledge base"):
+                    get_knowledge_base().delete_source(name)
+                    knowledge_base_overview.clear()
+                    st.rerun()
+            if stats["dead_rows"] and st.button("Compact", key="kb_compact", help="Reclaim space from removed sources"):
+                get_knowledge_base().compact()
+                knowledge_base_overview.clear()
+                st.rerun()
+
+        with st.expander("Shared source cache"):
+            stats = get_content_cache().stats()
+            st.caption(
+                f"{stats['entries']} sources · {stats['bytes'] / 2**20:.1f} of {stats['max_bytes'] / 2**20:.0f} MB\n\n"
+                f"{stats['hits']} hits · {stats['misses']} misses · "
+                f"{stats['evictions']} evictions · {stats['expirations']} expired"
+            )
+            flights = get_source_flights().stats()
+            st.caption(
+                f"{sum(flights['executed'].values())} fetches/parses · "
+                f"{sum(flights['coalesced'].values())} duplicates coalesced · {flights['in_flight']} in flight"
+            )
+        with st.expander("Recent web fetches"):
+            fetches = recent_fetches()[:10]
+            if not fetches:
+                st.caption("No pages fetched yet.")
+            for fetch in fetches:
+                st.caption(
+                    f"{fetch['status']} · {fetch['elapsed'] * 1000:.0f} ms · "
+                    f"{fetch['bytes'] / 1024:.1f} KB · {fetch['url']}"
+                )
+
+        with st.expander("Boilerplate removal"):
+            pages = get_boilerplate_registry().savings(limit=10)
+            if not pages:
+                st.caption("No pages extracted yet.")
+            for page in pages:
+                saved = page["raw_tokens"] - page["tokens"]
+                st.caption(
+                    f"~{page['raw_tokens']} → ~{page['tokens']} tokens "
+                    f"(-{saved / max(1, page['raw_tokens']):.0%}, {page['dropped_blocks']} blocks dropped) · {page['url']}"
+                )
+
         st.markdown("---")
         if st.button("Clear Chat History", key="clear_chat"):
-            st.session_state.chat_history = []
-            st.session_state.content_cache = {}
+            new_conversation()
             st.rerun()
         
         if st.session_state.get('chat_history', []):
             st.markdown("---")
-            chat_history_text = "\n\n".join([
-                f"{msg['role'].upper()}: {msg['content']}" 
-                for msg in st.session_state.chat_history
-            ])
+            # The transcript is only built when the button is clicked
             st.download_button(
                 label="Download Chat History",
-                data=chat_history_text,
+                data=functools.partial(export_transcript, st.session_state.conversation_id),
                 file_name=f"chat_history_{int(time.time())}.txt",
                 mime="text/plain"
             ) 
\ No newline at end of file
@@ -1,42 +1,293 @@
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APIStatusError, APITimeoutError
 import streamlit as st
+import datetime
+import email.utils
 import json
-import requests
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
 
-class DeepSeekAPI:
-    def __init__(self, api_key):
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
-
-    def make_api_call(self, messages):
-        """Make API call with error handling"""
+# Resilience settings for calls to the DeepSeek API
+API_TIMEOUT = float(os.getenv("DEEPSEEK_TIMEOUT", "60"))
+API_MAX_RETRIES = int(os.getenv("DEEPSEEK_MAX_RETRIES", "3"))
+API_BACKOFF_BASE = float(os.getenv("DEEPSEEK_BACKOFF_BASE", "0.5"))
+API_BACKOFF_MAX = float(os.getenv("DEEPSEEK_BACKOFF_MAX", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DEEPSEEK_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("DEEPSEEK_BREAKER_RESET", "30"))
+# A half-open probe that has not reported back after this long is assumed lost
+BREAKER_PROBE_TIMEOUT = float(os.getenv("DEEPSEEK_BREAKER_PROBE_TIMEOUT", str(API_TIMEOUT)))
+# Longest Retry-After worth waiting for; asked to wait longer, the call gives up
+API_RETRY_AFTER_MAX = float(os.getenv("DEEPSEEK_RETRY_AFTER_MAX", "60"))
+MAX_CACHED_CLIENTS = int(os.getenv("DEEPSEEK_MAX_CACHED_CLIENTS", "32"))
+
+def usage_to_dict(usage):
+    """Token usage as a plain dict, including DeepSeek's prompt cache counters"""
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "prompt_cache_hit_tokens": getattr(usage, "prompt_cache_hit_tokens", None),
+        "prompt_cache_miss_tokens": getattr(usage, "prompt_cache_miss_tokens", None),
+    }
+
+def iter_stream_deltas(response, started, timing, usage):
+    """Yield content deltas from a streamed completion
+
+    Fills timing["ttft"] on the first delta and usage from the final chunk.
+    """
+    for chunk in response:
+        if getattr(chunk, "usage", None):
+            usage.update(usage_to_dict(chunk.usage))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if "ttft" not in timing:
+            timing["ttft"] = time.perf_counter() - started
+        yield delta
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"DeepSeek API is failing; calls are paused for another {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+class CallCancelledError(Exception):
+    """Raised by create_completion when its cancel event is set before or between attempts"""
+
+class CircuitBreaker:
+    """Stops calling the API after repeated failures, probing again after a cool-down
+
+    closed -> open after `failure_threshold` consecutive failures; open -> half_open
+    once `reset_timeout` has passed, letting a single probe call through; the probe's
+    outcome closes or re-opens the circuit. If the probe never reports back (its
+    thread died), another probe is let through after `probe_timeout`.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT,
+                 probe_timeout=BREAKER_PROBE_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.short_circuited = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            remaining = self.opened_at + self.reset_timeout - now
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+                self.probe_started = now
+                return
+            if self.state == "half_open" and now - self.probe_started >= self.probe_timeout:
+                self.probe_started = now
+                return
+            self.short_circuited += 1
+            raise CircuitOpenError(max(remaining, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring Retry-After
+
+    A server-requested Retry-After is waited out in full, not capped at
+    `max_delay`; one longer than `max_retry_after` makes the call give up.
+    """
+
+    def __init__(self, max_retries=API_MAX_RETRIES, base_delay=API_BACKOFF_BASE, max_delay=API_BACKOFF_MAX,
+                 max_retry_after=API_RETRY_AFTER_MAX):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def is_retryable(self, error):
+        if isinstance(error, (APIConnectionError, APITimeoutError)):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before retrying, or None if the server asks for too long a wait"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+def retry_after_seconds(error):
+    """Delay requested by the server through Retry-After / retry-after-ms, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
         try:
-            st.write("Attempting to connect to DeepSeek API...")  # Debug statement
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000
-            )
-            if not response or not response.choices:
-                st.error("Received empty response from API")
-                return None
-                
-            return response.choices[0].message.content
-        except requests.exceptions.ConnectionError as ce:
-            st.error("Connection error: Unable to reach the DeepSeek API.")
-            st.error(f"Details: {str(ce)}")
-        except Exception as e:
-            st.error(f"API Error: {str(e)}")
-            if hasattr(e, 'response') and hasattr(e.response, 'text'):
-                try:
-                    error_details = json.loads(e.response.text)
-                    st.error(f"API Error Details: {json.dumps(error_details, indent=2)}")
-                except json.JSONDecodeError:
-                    st.error(f"Raw API Error Response: {e.response.text}")
-            return None
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Malformed; ignore it rather than mask the API error being handled
+        return None
+    if parsed.tzinfo is None:
+        # HTTP dates are GMT
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, parsed.timestamp() - time.time())
+
+# Shared by every session so an outage trips the breaker once for everyone
+_breakers = {}
+_breakers_lock = threading.Lock()
+api_stats = {"calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0}
+_api_stats_lock = threading.Lock()
+
+def _count(name):
+    with _api_stats_lock:
+        api_stats[name] += 1
+
+def get_circuit_breaker(base_url):
+    with _breakers_lock:
+        if base_url not in _breakers:
+            _breakers[base_url] = CircuitBreaker()
+        return _breakers[base_url]
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+def get_openai_client(api_key, base_url):
+    """OpenAI client shared by every DeepSeekAPI with the same key and endpoint
+
+    Reusing the client keeps its HTTP connection pool (and keep-alive
+    connections) across Streamlit reruns and sessions.
+    """
+    with _clients_lock:
+        key = (api_key, base_url)
+        if key in _clients:
+            _clients.move_to_end(key)
+            return _clients[key]
+        # Retries are handled in DeepSeekAPI rather than inside the OpenAI client
+        client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        _clients[key] = client
+        while len(_clients) > MAX_CACHED_CLIENTS:
+            _clients.popitem(last=False)
+        return client
+
+def resilience_stats():
+    """Retry counters and breaker state for display"""
+    with _breakers_lock:
+        breakers = {url: breaker.state for url, breaker in _breakers.items()}
+        short_circuited = sum(breaker.short_circuited for breaker in _breakers.values())
+        times_opened = sum(breaker.times_opened for breaker in _breakers.values())
+    with _api_stats_lock:
+        stats = dict(api_stats)
+    return dict(stats, breakers=breakers, short_circuited=short_circuited, times_opened=times_opened)
+
+class DeepSeekAPI:
+    def __init__(self, api_key, base_url="https://api.deepseek.com", timeout=API_TIMEOUT, retry_policy=None):
+        self.client = get_openai_client(api_key, base_url)
+        self.model = "deepseek-chat"
+        self.temperature = 0.7
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = get_circuit_breaker(base_url)
+
+    def create_completion(self, messages, stream=False, max_tokens=2000, timeout=None, cancel=None,
+                          on_rate_limited=None):
+        """Call the chat completions endpoint with retries, a deadline and the circuit breaker
+
+        Raises CircuitOpenError while the API is known to be failing, and the last
+        API error once retries or the deadline are exhausted. Setting the `cancel`
+        event stops the retries: the backoff wait ends at once and
+        CallCancelledError is raised instead of another attempt.
+        `on_rate_limited` is called with every 429 as soon as it arrives.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        extra = {"stream_options": {"include_usage": True}} if stream else {}
+        attempt = 0
+        _count("calls")
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise CallCancelledError()
+            self.breaker.before_call()
+            remaining = deadline - time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens,
+                    stream=stream,
+                    timeout=remaining,
+                    **extra
+                )
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if on_rate_limited is not None and getattr(e, "status_code", None) == 429:
+                    on_rate_limited(e)
+                if not self.retry_policy.is_retryable(e):
+                    # The API answered (e.g. 400/401), so it is not an outage
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                delay = self.retry_policy.delay(attempt, e)
+                if delay is None or attempt >= self.retry_policy.max_retries:
+                    _count("failures")
+                    raise
+                if time.monotonic() + delay >= deadline:
+                    _count("deadline_exceeded")
+                    raise
+                attempt += 1
+                _count("retries")
+                if cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+
+    def report_error(self, e):
+        """Show API error details in the UI"""
+        st.error(f"API Error: {str(e)}")
+        if hasattr(e, 'response') and hasattr(e.response, 'text'):
+            try:
+                error_details = json.loads(e.response.text)
+                st.error(f"API Error Details: {json.dumps(error_details, indent=2)}")
+            except json.JSONDecodeError:
+                st.error(f"Raw API Error Response: {e.response.text}")
 
     def format_message_for_api(self, msg):
         """Format chat message for API consumption"""
@@ -44,4 +295,4 @@ class DeepSeekAPI:
             parts = msg["content"].split("\n")
             question = parts[1].replace("Question: ", "").strip()
             return {"role": msg["role"], "content": question}
-        return {"role": msg["role"], "content": msg["content"]} 
\ No newline at end of file
+        return {"role": msg["role"], "content": msg["content"]}
@@ -0,0 +1,189 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.content_processor import extract_text_from_pdf
+from src.services.crawler import scrape_sources
+from src.services.history_manager import HistoryManager, HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS
+from src.utils.retrieval import BM25Index, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from src.utils.content_cache import get_content_cache, url_cache_key, pdf_digest_cache_key, DEFAULT_URL_TTL
+from src.utils.upload_spool import spool_upload, hold_spooled, SpooledFile, UploadTooLargeError
+from src.utils.single_flight import get_source_flights
+from src.services.response_cache import response_cache_key
+from src.services.prompt_builder import SYSTEM_PROMPT, DEFAULT_PROMPT_LAYOUT, source_context, build_messages
+from src.services.knowledge_base import get_knowledge_base
+from src.services.telemetry import span
+
+# Background threads that load sources while the user is still typing the question
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+class SourceError(Exception):
+    """A URL or PDF could not be turned into usable content"""
+
+class PreparedRequest:
+    """Everything needed to call the API for one question
+
+    `summary` is a PendingSummary the GenerationJob must write first, or None.
+    """
+
+    def __init__(self, messages, content, context_tokens, history_messages, cache_key, summary=None):
+        self.messages = messages
+        self.content = content
+        self.context_tokens = context_tokens
+        self.history_messages = history_messages
+        self.cache_key = cache_key
+        self.summary = summary
+
+def load_source(url=None, pdf_file=None):
+    """Indexed content for a URL (or URL list / sitemap) or a PDF file
+
+    `pdf_file` may be an upload, a path or an already spooled file. Uploads
+    are spooled to disk and parsed from a memory map. Sources are shared by all
+    sessions through the content cache, keyed by URL or PDF content hash, and
+    concurrent loads of the same source are coalesced into one. Raises
+    SourceError if nothing usable was extracted or the PDF is over the size limit.
+    """
+    cache = get_content_cache()
+    spooled = None
+    if url:
+        source_key = url_cache_key(url)
+    elif isinstance(pdf_file, SpooledFile):
+        spooled = pdf_file
+    else:
+        with span("pdf_spool"):
+            try:
+                spooled = spool_upload(pdf_file)
+            except UploadTooLargeError as e:
+                raise SourceError(str(e))
+    if spooled is not None:
+        source_key = pdf_digest_cache_key(spooled.sha256)
+    index = cache.get(source_key)
+    if index is None:
+        # Sessions asking for the same source at once share a single fetch and parse
+        with span("source_load"):
+            index = get_source_flights().do(source_key, lambda: _build_index(source_key, url, spooled))
+
+    if not index.chunks:
+        raise SourceError("Failed to retrieve content.")
+    return index
+
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+def prefetch_source(url=None, pdf_file=None):
+    """Start load_source in the background and return a Future of the index
+
+    A later load_source for the same source joins the running load through
+    the coalescer, or hits the content cache once it has finished.
+    """
+    global _prefetch_executor
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _prefetch_executor.submit(load_source, url=url, pdf_file=pdf_file)
+
+def await_prefetch(future, url=None, pdf_file=None):
+    """Index for a source from its prefetch Future, loading it here when that is faster
+
+    A prefetch still queued behind other sessions' loads is cancelled and the
+    source loaded on the calling thread instead. A failed prefetch is retried
+    rather than reported again.
+    """
+    if future.done() and future.exception() is not None:
+        return load_source(url=url, pdf_file=pdf_file)
+    if future.cancel():
+        return load_source(url=url, pdf_file=pdf_file)
+    return future.result()
+
+def _build_index(source_key, url, spooled):
+    """Fetch or parse a source, index it and cache the index"""
+    cache = get_content_cache()
+    # A call that just finished may have cached it between our miss and now;
+    # peek so that miss is not counted twice
+    index = cache.peek(source_key)
+    if index is not None:
+        return index
+    # Ingest the full document; only relevant chunks are sent per question
+    if url:
+        with span("scrape"):
+            try:
+                content = scrape_sources(url, max_length=None)
+            except ValueError as e:
+                raise SourceError(str(e)) from e
+    else:
+        with span("pdf_extract"), hold_spooled(spooled.path):
+            try:
+                content = extract_text_from_pdf(spooled.path, max_length=None)
+            except Exception as e:
+                raise SourceError(f"Error reading PDF: {e}") from e
+    with span("index"):
+        index = BM25Index.from_text(content)
+    cache.put(source_key, index, index.nbytes, ttl=DEFAULT_URL_TTL if url else None)
+    return index
+
+def save_to_knowledge_base(name, index):
+    """Add a loaded source to the knowledge base; returns the number of new chunks"""
+    with span("kb_add"):
+        return get_knowledge_base().add_source(name, index.chunks)
+
+def prepare_request(api_service, question, index, history, state, max_tokens=2000):
+    """Build the API messages and response cache key for a question
+
+    `state` is a mapping holding the user's settings (prompt layout, retrieval
+    and history budgets) and the running history summary; in the app this is
+    st.session_state. A history summary that has to be written is not written
+    here: it comes back as `summary`, for the GenerationJob to write.
+    `max_tokens` is the completion budget the request will be sent with.
+    """
+    with span("prompt_build"):
+        content = None
+        context_tokens = 0
+        layout = state.get("prompt_layout", DEFAULT_PROMPT_LAYOUT)
+        if index is not None:
+            content, context_tokens = source_context(
+                index,
+                question,
+                layout=layout,
+                top_k=state.get("retrieval_top_k", DEFAULT_TOP_K),
+                token_budget=state.get("retrieval_token_budget", DEFAULT_TOKEN_BUDGET)
+            )
+
+    # Search every saved source as well, within what is left of the budget
+    if state.get("use_knowledge_base"):
+        with span("kb_search"):
+            kb_content, kb_tokens = get_knowledge_base().select_context(
+                question,
+                top_k=state.get("retrieval_top_k", DEFAULT_TOP_K),
+                token_budget=max(0, state.get("retrieval_token_budget", DEFAULT_TOKEN_BUDGET) - context_tokens)
+            )
+        if kb_content:
+            content = f"{content}\n\n{kb_content}" if content else kb_content
+            context_tokens += kb_tokens
+
+    # Add chat history for context, summarizing older turns to stay within budget
+    with span("history"):
+        history_manager = HistoryManager(
+            api_service,
+            state,
+            token_budget=state.get("history_token_budget", HISTORY_TOKEN_BUDGET),
+            keep_turns=state.get("history_keep_turns", HISTORY_KEEP_TURNS)
+        )
+        history_messages = history_manager.build(history)
+        summary = history_manager.pending_summary
+
+    with span("prompt_build"):
+        messages = build_messages(question, content, history_messages, layout=layout)
+        # An unwritten summary is keyed by what it will summarize
+        key_messages = [
+            {"role": msg["role"], "content": summary.key} if summary and msg is summary.message else msg
+            for msg in history_messages
+        ]
+        cache_key = response_cache_key(
+            api_service.model,
+            api_service.temperature,
+            SYSTEM_PROMPT,
+            content,
+            question,
+            key_messages,
+            max_tokens
+        )
+    return PreparedRequest(messages, content, context_tokens, history_messages, cache_key, summary)
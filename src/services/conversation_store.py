@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", os.path.join(".cache", "conversations.sqlite3"))
+EXPORT_BATCH_SIZE = 500
+
+# Keys of a chat message that are columns; anything else is kept as JSON in `meta`
+MESSAGE_COLUMNS = ("id", "role", "content")
+
+class ConversationStore:
+    """Append-only message log per conversation in SQLite (WAL mode)
+
+    WAL lets any number of sessions read while one writes, and every write is a
+    single short transaction, so concurrent sessions only ever wait on each
+    other for the duration of an insert.
+    """
+
+    def __init__(self, path=CONVERSATION_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    meta TEXT,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def new_conversation_id():
+        return uuid.uuid4().hex
+
+    def append(self, conversation_id, messages):
+        """Append messages in one transaction and set their "id" keys"""
+        now = time.time()
+        with self._connect() as conn:
+            for message in messages:
+                meta = {k: v for k, v in message.items() if k not in MESSAGE_COLUMNS}
+                cursor = conn.execute(
+                    "INSERT INTO messages (conversation_id, role, content, meta, created) VALUES (?, ?, ?, ?, ?)",
+                    (conversation_id, message["role"], message["content"], json.dumps(meta) if meta else None, now)
+                )
+                message["id"] = cursor.lastrowid
+        return messages
+
+    def recent(self, conversation_id, limit, before_id=None):
+        """Up to `limit` messages older than before_id (or the newest ones), oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, role, content, meta FROM messages WHERE conversation_id = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (conversation_id, before_id if before_id is not None else 2**63 - 1, limit)
+            ).fetchall()
+        return [self._message(row) for row in reversed(rows)]
+
+    def count(self, conversation_id, before_id=None):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ? AND id < ?",
+                (conversation_id, before_id if before_id is not None else 2**63 - 1)
+            ).fetchone()[0]
+
+    def iter_messages(self, conversation_id, batch_size=EXPORT_BATCH_SIZE):
+        """Yield every message of a conversation in order, reading in batches"""
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, role, content, meta FROM messages WHERE conversation_id = ? AND id > ? "
+                    "ORDER BY id LIMIT ?",
+                    (conversation_id, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._message(row)
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _message(row):
+        message_id, role, content, meta = row
+        message = {"id": message_id, "role": role, "content": content}
+        if meta:
+            message.update(json.loads(meta))
+        return message
+
+_conversation_store = None
+_conversation_store_lock = threading.Lock()
+
+def get_conversation_store():
+    """Conversation store shared by all sessions in this process"""
+    global _conversation_store
+    with _conversation_store_lock:
+        if _conversation_store is None:
+            _conversation_store = ConversationStore()
+        return _conversation_store
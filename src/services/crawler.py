@@ -0,0 +1,142 @@
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from src.services import http_client
+from src.utils.content_processor import fetch_page_text, truncate_text
+from src.utils.boilerplate import strip_learned_boilerplate
+
+CRAWL_MAX_WORKERS = int(os.getenv("CRAWL_MAX_WORKERS", "8"))
+CRAWL_HOST_RPS = float(os.getenv("CRAWL_HOST_RPS", "4"))
+MAX_SITEMAP_URLS = int(os.getenv("MAX_SITEMAP_URLS", "200"))
+
+URL_SEPARATOR = re.compile(r"[\s,]+")
+
+def parse_url_list(text):
+    """Split user input into a de-duplicated list of URLs, keeping order"""
+    urls = []
+    for url in URL_SEPARATOR.split(text.strip()):
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+SITEMAP_ROOTS = ("urlset", "sitemapindex")
+
+def may_be_sitemap(url):
+    """Whether a URL is worth checking for a sitemap (ordinary pages are not fetched twice)"""
+    path = urlparse(url).path.lower()
+    return path.endswith(".xml") or "sitemap" in path
+
+def sitemap_root(text):
+    """Root element of a sitemap or sitemap index, or None if `text` is something else (a page, an RSS feed)"""
+    if not text:
+        return None
+    try:
+        root = ET.fromstring(text.encode())
+    except ET.ParseError:
+        return None
+    return root if root.tag.rsplit("}", 1)[-1] in SITEMAP_ROOTS else None
+
+def _locations(root):
+    return [loc.text.strip() for loc in root.iter() if loc.tag.endswith("loc") and loc.text]
+
+def fetch_sitemap_urls(sitemap_url, limit=MAX_SITEMAP_URLS, root=None):
+    """Page URLs listed in a sitemap, following one level of sitemap index
+
+    `root` is the already parsed sitemap, if the caller fetched it.
+    """
+    if root is None:
+        root = sitemap_root(http_client.fetch(sitemap_url).text)
+        if root is None:
+            raise ValueError(f"{sitemap_url} is not a sitemap")
+    locations = _locations(root)
+
+    if not root.tag.endswith("sitemapindex"):
+        return locations[:limit]
+
+    urls = []
+    for nested in locations:
+        nested_root = sitemap_root(http_client.fetch(nested).text)
+        if nested_root is not None:
+            urls.extend(_locations(nested_root))
+        if len(urls) >= limit:
+            break
+    return urls[:limit]
+
+class HostRateLimiter:
+    """Spaces out requests to the same host to at most `rate` per second"""
+
+    def __init__(self, rate=CRAWL_HOST_RPS):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+            if len(self._next_slot) > 1000:
+                # Hosts whose next slot has passed need no entry
+                self._next_slot = {h: t for h, t in self._next_slot.items() if t > now}
+        if slot > now:
+            time.sleep(slot - now)
+
+_host_limiter = None
+_host_limiter_lock = threading.Lock()
+
+def get_host_limiter():
+    """Per-host politeness limit shared by every crawl in this process"""
+    global _host_limiter
+    with _host_limiter_lock:
+        if _host_limiter is None:
+            _host_limiter = HostRateLimiter()
+        return _host_limiter
+
+def crawl(urls, max_workers=CRAWL_MAX_WORKERS, rate_limiter=None):
+    """Fetch and clean pages concurrently
+
+    Returns (url, text, error) tuples in the order the URLs were given.
+    """
+    rate_limiter = rate_limiter or get_host_limiter()
+
+    def fetch_one(url):
+        rate_limiter.wait(url)
+        try:
+            return url, fetch_page_text(url), None
+        except Exception as e:
+            return url, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        return list(pool.map(fetch_one, urls))
+
+def scrape_sources(url_input, max_length=None):
+    """Scrape one URL, a list of URLs or a sitemap into one combined source text
+
+    Raises ValueError when the sitemap cannot be read or no page could be fetched.
+    """
+    urls = parse_url_list(url_input)
+    try:
+        if len(urls) == 1 and may_be_sitemap(urls[0]):
+            # Decided by the document, not the name: /sitemap-guide.html or an RSS feed is a page
+            root = sitemap_root(http_client.fetch(urls[0]).text)
+            if root is not None:
+                urls = fetch_sitemap_urls(urls[0], root=root)
+    except Exception as e:
+        raise ValueError(f"Error reading sitemap: {e}") from e
+    if not urls:
+        raise ValueError("No URLs found")
+
+    pages = crawl(urls)
+    # Pages fetched before the site's repeated blocks were learned get them removed now
+    fetched = [(url, strip_learned_boilerplate(url, text)) for url, text, error in pages if error is None and text]
+    if not fetched:
+        raise ValueError(f"None of the {len(urls)} pages could be fetched ({pages[0][2]})")
+
+    if len(urls) == 1:
+        return truncate_text(fetched[0][1], max_length)
+    return truncate_text("\n\n".join(f"Source: {url}\n{text}" for url, text in fetched), max_length)
@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from src.services.api_service import iter_stream_deltas
+from src.services.scheduler import get_scheduler
+
+class GenerationJob:
+    """One streamed completion running on a background thread
+
+    The Streamlit script polls `text` and `status` across reruns; `cancel()`
+    closes the HTTP stream so the upstream request is aborted as well. A
+    pending history `summary` (see PreparedRequest) is written first, filling
+    in its message in `messages`.
+    """
+
+    def __init__(self, fingerprint, api_service, messages, max_tokens=2000, meta=None, summary=None):
+        self.id = uuid.uuid4().hex
+        self.fingerprint = fingerprint
+        self.api_service = api_service
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.summary = summary
+        self.meta = meta or {}
+        self.status = "queued"
+        self.parts = []
+        self.error = None
+        self.timing = {}
+        self.usage = {}
+        self.future = None
+        # Set by the scheduler to hear about 429s while the job still retries them
+        self.on_rate_limited = None
+        self.submitted = time.perf_counter()
+        self._response = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def total_usage(self):
+        """Usage of the answer plus the summary written for it, for rate limiting"""
+        summary_tokens = ((self.summary.usage if self.summary else None) or {}).get("total_tokens")
+        if self.usage and summary_tokens:
+            return dict(self.usage, total_tokens=self.usage["total_tokens"] + summary_tokens)
+        return self.usage
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (or was cancelled); returns whether it has"""
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        """Stop generation and abort the in-flight HTTP request"""
+        self._cancelled.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+        with self._lock:
+            if not self.finished:
+                # Finished for whoever polls the job right away. A dispatched job is
+                # never cancelled through its future, though: the scheduler's worker
+                # still runs (returning early) to give back the slot and the tokens.
+                self.status = "cancelled"
+        self._finished.set()
+
+    def run(self):
+        started = time.perf_counter()
+        self.timing["queue"] = started - self.submitted
+        try:
+            with self._lock:
+                if self.cancelled:
+                    return
+                self.status = "running"
+            if self.summary is not None and self.summary.text is None:
+                self.summary.run(self.api_service, cancel=self._cancelled, on_rate_limited=self.on_rate_limited)
+                if self.cancelled:
+                    return
+            response = self.api_service.create_completion(
+                self.messages,
+                stream=True,
+                max_tokens=self.max_tokens,
+                cancel=self._cancelled,
+                on_rate_limited=self.on_rate_limited
+            )
+            with self._lock:
+                self._response = response
+            if self.cancelled:
+                response.close()
+                return
+            for delta in iter_stream_deltas(response, started, self.timing, self.usage):
+                if self.cancelled:
+                    break
+                self.parts.append(delta)
+        except Exception as e:
+            if not self.cancelled:
+                self.error = e
+                if self._response is not None:
+                    # Failed mid-stream, after create_completion had succeeded
+                    self.api_service.breaker.record_failure()
+        finally:
+            self.timing["total"] = time.perf_counter() - started
+            if self.cancelled:
+                self.status = "cancelled"
+            elif self.error is not None:
+                self.status = "failed"
+            else:
+                self.status = "done"
+            with self._lock:
+                if self._response is not None:
+                    self._response.close()
+                self._response = None
+            self._finished.set()
+
+def start_generation(job, client_id=None):
+    """Queue a job on the shared fair scheduler and return it
+
+    `client_id` identifies the browser session, so jobs are dispatched
+    round-robin across sessions within the API rate limits.
+    """
+    return get_scheduler().submit(job, client_id)
+
+def cancel_generation(job):
+    """Cancel a job whether it is still queued or already streaming"""
+    get_scheduler().cancel(job)
+    job.cancel()
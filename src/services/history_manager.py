@@ -0,0 +1,165 @@
+import hashlib
+import os
+from src.services.api_service import usage_to_dict
+from src.utils.retrieval import estimate_tokens
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+SUMMARY_MAX_TOKENS = 300
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in at most {words} words. Keep facts, names, "
+    "numbers and open questions the assistant may need later. Reply with the summary only."
+)
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class HistoryManager:
+    """Keeps the history sent with each request under a token budget
+
+    The last `keep_turns` exchanges are sent verbatim. Older messages are folded
+    into a running summary that is cached in `state` (e.g. st.session_state) and
+    only extended when more messages fall out of the window. build() never calls
+    the API: a summary that has to be written is left in `pending_summary` for
+    the generation job to write before its completion.
+    """
+
+    def __init__(self, api_service, state, token_budget=HISTORY_TOKEN_BUDGET, keep_turns=HISTORY_KEEP_TURNS):
+        self.api_service = api_service
+        self.state = state
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.pending_summary = None
+        if "history_token_counts" not in state:
+            state["history_token_counts"] = {}
+        if "history_summary" not in state:
+            state["history_summary"] = None
+
+    def count_tokens(self, message):
+        """Token estimate for one API message, cached by content"""
+        counts = self.state["history_token_counts"]
+        key = _digest(message["content"])
+        if key not in counts:
+            counts[key] = estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        return counts[key]
+
+    def build(self, history):
+        """API messages for the given chat history, summary first"""
+        formatted = [self.api_service.format_message_for_api(msg) for msg in history]
+        split = max(0, len(formatted) - 2 * self.keep_turns)
+
+        # Fold more turns into the summary while the verbatim part is over budget
+        summary_allowance = SUMMARY_MAX_TOKENS if split else 0
+        recent_tokens = sum(self.count_tokens(msg) for msg in formatted[split:])
+        while split < len(formatted) and recent_tokens + summary_allowance > self.token_budget:
+            # Fold whole exchanges (user + assistant) at a time
+            for msg in formatted[split:split + 2]:
+                recent_tokens -= self.count_tokens(msg)
+            split = min(split + 2, len(formatted))
+            summary_allowance = SUMMARY_MAX_TOKENS
+
+        messages = []
+        self.pending_summary = None
+        if split:
+            messages.append(self._summary_message(formatted, split))
+        messages.extend(formatted[split:])
+        self._prune_token_counts(formatted)
+        return messages
+
+    def _prune_token_counts(self, formatted):
+        """Forget counts for messages no longer in the history, so the cache stays bounded"""
+        counts = self.state["history_token_counts"]
+        live = {_digest(msg["content"]) for msg in formatted}
+        for key in [key for key in counts if key not in live]:
+            del counts[key]
+
+    def _summary_message(self, formatted, split):
+        """Summary of formatted[:split] from the cache, or a PendingSummary's message extending it"""
+        cached = self.state["history_summary"]
+        if cached and cached["covered"] <= split and cached["digest"] == _digest(formatted[cached["covered"] - 1]["content"]):
+            if cached["covered"] == split:
+                return summary_message(cached["text"])
+            previous, start = cached["text"], cached["covered"]
+        else:
+            previous, start = None, 0
+
+        self.pending_summary = PendingSummary(previous, formatted[start:split], split, _digest(formatted[split - 1]["content"]))
+        return self.pending_summary.message
+
+def summary_message(text):
+    return {"role": "system", "content": f"Summary of the earlier conversation: {text}"}
+
+class PendingSummary:
+    """A history summary that the generation job writes before its completion
+
+    `message` is already in the request's messages and gets its content from
+    run(), on the worker thread that holds the job's scheduler slot and token
+    reservation, so the summary is queued fairly and cancelled with the job.
+    commit() then caches it in the session state for later turns.
+    """
+
+    def __init__(self, previous, messages, covered, digest):
+        self.covered = covered
+        self.digest = digest
+        transcript = "\n\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+        if previous:
+            transcript = f"EARLIER SUMMARY: {previous}\n\n{transcript}"
+        self.transcript = transcript
+        self.message = {"role": "system", "content": ""}
+        self.text = None
+        self.usage = None
+
+    @property
+    def key(self):
+        """Stands in for the summary text in response cache keys"""
+        return f"Summary of: {_digest(self.transcript)}"
+
+    def request_messages(self):
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=SUMMARY_MAX_TOKENS * 3 // 4)},
+            {"role": "user", "content": self.transcript}
+        ]
+
+    def estimated_tokens(self):
+        """Tokens to reserve for the summary call"""
+        return sum(estimate_tokens(msg["content"]) for msg in self.request_messages()) + SUMMARY_MAX_TOKENS
+
+    def run(self, api_service, **kwargs):
+        """Write the summary into `message` (blocking; called on the generation worker)"""
+        text = None
+        try:
+            response = api_service.create_completion(self.request_messages(), max_tokens=SUMMARY_MAX_TOKENS, **kwargs)
+            self.usage = usage_to_dict(response.usage)
+            if response.choices:
+                text = response.choices[0].message.content
+        except Exception:
+            # The answer's own call reports an outage; the summary just falls back
+            pass
+        # Fall back to the most recent part of the transcript if summarization failed
+        self.text = text or self.transcript[-SUMMARY_MAX_TOKENS * 4:]
+        self.message["content"] = summary_message(self.text)["content"]
+
+    def commit(self, state):
+        """Cache a written summary in `state` so later turns extend it"""
+        if self.text is not None:
+            state["history_summary"] = {"covered": self.covered, "digest": self.digest, "text": self.text}
+
+def drop_summarized(history, state, max_messages):
+    """Drop the oldest exchanges from `history` (in place) once it exceeds max_messages
+
+    Only messages already folded into the running summary are dropped, so the
+    API context is unchanged; the newest summarized message is kept because the
+    summary is anchored to it. Returns the number of messages dropped.
+    """
+    summary = state.get("history_summary")
+    if len(history) <= max_messages or not summary:
+        return 0
+    # Whole exchanges only, keeping history aligned on user/assistant pairs
+    drop = min(len(history) - max_messages, summary["covered"] - 1) // 2 * 2
+    if drop <= 0:
+        return 0
+    del history[:drop]
+    summary["covered"] -= drop
+    return drop
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+MAX_REVALIDATION_ENTRIES = 512
+
+class FetchResult:
+    """Outcome of one GET, with timing and transfer size"""
+
+    def __init__(self, url, status_code, text, elapsed, bytes_transferred,
+                 etag=None, last_modified=None, extracted_text=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.elapsed = elapsed
+        self.bytes_transferred = bytes_transferred
+        self.etag = etag
+        self.last_modified = last_modified
+        # Text previously extracted from this page, set when the server answered 304
+        self.extracted_text = extracted_text
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+_session = None
+_session_lock = threading.Lock()
+_revalidation = OrderedDict()  # url -> (etag, last_modified, extracted_text)
+_revalidation_lock = threading.Lock()
+_fetch_log = deque(maxlen=50)
+
+def get_http_session():
+    """Keep-alive session shared by every scrape in this process"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update({
+                "User-Agent": "AlisChatbot/1.0 (+https://github.com/AliAkil1/LocalLLM)",
+                "Accept-Encoding": "gzip, deflate",
+            })
+        return _session
+
+def fetch(url, timeout=None):
+    """GET a page, revalidating with ETag/Last-Modified when it was fetched before
+
+    A 304 response carries the previously extracted text in extracted_text.
+    Raises requests exceptions on network errors and 4xx/5xx responses.
+    """
+    headers = {}
+    with _revalidation_lock:
+        validators = _revalidation.get(url)
+    if validators:
+        etag, last_modified, _ = validators
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    started = time.perf_counter()
+    response = get_http_session().get(
+        url,
+        headers=headers,
+        timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+        stream=True
+    )
+    try:
+        body = response.content
+        # Bytes read off the wire, before decompression
+        bytes_transferred = response.raw.tell() or len(body)
+    finally:
+        response.close()
+    elapsed = time.perf_counter() - started
+
+    _fetch_log.append({
+        "url": url,
+        "status": response.status_code,
+        "elapsed": elapsed,
+        "bytes": bytes_transferred,
+    })
+    response.raise_for_status()
+
+    if response.status_code == 304 and validators:
+        with _revalidation_lock:
+            if url in _revalidation:
+                _revalidation.move_to_end(url)
+        return FetchResult(url, 304, None, elapsed, bytes_transferred, extracted_text=validators[2])
+
+    return FetchResult(
+        url,
+        response.status_code,
+        response.text,
+        elapsed,
+        bytes_transferred,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified")
+    )
+
+def remember_extracted(result, extracted_text):
+    """Keep the text extracted from a response so a later 304 can reuse it"""
+    if not result.etag and not result.last_modified:
+        return
+    with _revalidation_lock:
+        _revalidation[result.url] = (result.etag, result.last_modified, extracted_text)
+        _revalidation.move_to_end(result.url)
+        while len(_revalidation) > MAX_REVALIDATION_ENTRIES:
+            _revalidation.popitem(last=False)
+
+def recent_fetches():
+    """Most recent fetches, newest first"""
+    return list(reversed(_fetch_log))
@@ -0,0 +1,298 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+import numpy as np
+from src.utils.retrieval import tokenize, estimate_tokens, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+
+KB_DIR = os.getenv("KNOWLEDGE_BASE_DIR", os.path.join(".cache", "knowledge_base"))
+KB_DIMENSIONS = int(os.getenv("KNOWLEDGE_BASE_DIMENSIONS", "256"))
+VECTOR_DTYPE = np.float32
+
+def embed(texts, dimensions=KB_DIMENSIONS):
+    """Hashing-vectorizer embeddings: signed feature hashing of unigrams and bigrams
+
+    Fully offline and stateless, so vectors never need refitting as the corpus
+    grows. Rows are L2-normalized, making a dot product the cosine similarity.
+    """
+    vectors = np.zeros((len(texts), dimensions), dtype=VECTOR_DTYPE)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        vectors[row] = np.bincount(hashes % dimensions, weights=signs, minlength=dimensions)
+    # Sublinear term frequency, then unit length
+    np.copyto(vectors, np.sign(vectors) * np.log1p(np.abs(vectors)))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+class KnowledgeBase:
+    """Chunks from many sources, searchable by cosine similarity
+
+    Vectors are appended to a flat float32 file that is memory-mapped for
+    queries; chunk text and source bookkeeping live in SQLite next to it. Row i
+    of the matrix is chunk i. Adding a source appends rows; deleting one zeroes
+    its rows (they can never score above zero) until compact() rewrites the file.
+
+    Several processes may share one directory (the app, API workers, the batch
+    runner). Writers serialize on an exclusive SQLite transaction and take row
+    numbers from the file itself, never from their own mapping. Every write
+    bumps a generation counter; a search reads it inside its own snapshot and
+    remaps first if it changed. compact() writes a new vector file and switches
+    to it in the same transaction that renumbers the chunks, so a reader always
+    pairs a file with the row numbers that belong to it.
+    """
+
+    def __init__(self, directory=KB_DIR, dimensions=KB_DIMENSIONS):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.db_path = os.path.join(directory, "chunks.sqlite3")
+        self.row_bytes = dimensions * np.dtype(VECTOR_DTYPE).itemsize
+        self.generation = None
+        self.vectors = np.zeros((0, dimensions), dtype=VECTOR_DTYPE)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    digest TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    added REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,
+                    source_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    tokens INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_id)")
+            conn.executemany(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                [("dimensions", str(dimensions)), ("generation", "0"), ("vectors_file", "vectors.f32")]
+            )
+            stored = int(conn.execute("SELECT value FROM meta WHERE key = 'dimensions'").fetchone()[0])
+        if stored != dimensions:
+            raise ValueError(f"Knowledge base at {directory} uses {stored} dimensions, not {dimensions}")
+
+        with self._snapshot() as conn:
+            self._current_vectors(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self, mode=""):
+        """Explicit transaction: a consistent read snapshot, or with mode="IMMEDIATE"
+        the write lock, which serializes writers across processes"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(f"BEGIN {mode}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _snapshot(self):
+        return self._transaction()
+
+    def _write(self):
+        return self._transaction("IMMEDIATE")
+
+    def _meta(self, conn, key):
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _bump_generation(self, conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+    def _vectors_path(self, conn):
+        path = os.path.join(self.directory, self._meta(conn, "vectors_file"))
+        if not os.path.exists(path):
+            open(path, "ab").close()
+        return path
+
+    def _map(self, path):
+        rows = os.path.getsize(path) // self.row_bytes
+        if rows == 0:
+            return np.zeros((0, self.dimensions), dtype=VECTOR_DTYPE)
+        return np.memmap(path, dtype=VECTOR_DTYPE, mode="r", shape=(rows, self.dimensions))
+
+    def _current_vectors(self, conn):
+        """This process's map of the vectors, remapped if another writer changed them"""
+        generation = int(self._meta(conn, "generation"))
+        with self._lock:
+            if generation != self.generation:
+                self.vectors = self._map(self._vectors_path(conn))
+                self.generation = generation
+            return self.vectors
+
+    def _file_rows(self, path):
+        """Whole rows in the vector file, dropping a partial row left by an interrupted append
+
+        Only called while holding the write lock, when no append can be in progress.
+        """
+        size = os.path.getsize(path)
+        if size % self.row_bytes:
+            with open(path, "r+b") as f:
+                f.truncate(size - size % self.row_bytes)
+        return size // self.row_bytes
+
+    def sources(self):
+        """(name, chunk_count, added) for every source, newest first"""
+        with self._connect() as conn:
+            return conn.execute("SELECT name, chunk_count, added FROM sources ORDER BY added DESC").fetchall()
+
+    def stats(self):
+        with self._snapshot() as conn:
+            sources, chunks = conn.execute("SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM sources").fetchone()
+            rows = len(self._current_vectors(conn))
+        return {"sources": sources, "chunks": chunks, "rows": rows, "dead_rows": rows - chunks, "bytes": rows * self.row_bytes}
+
+    def add_source(self, name, chunks):
+        """Embed and append a source's chunks, replacing an older version of it
+
+        Re-adding identical content is a no-op. Returns the number of chunks added.
+        """
+        digest = hashlib.sha256("\0".join(chunks).encode()).hexdigest()
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest FROM sources WHERE name = ?", (name,)).fetchone()
+        if row and row[0] == digest:
+            return 0
+
+        vectors = embed(chunks, self.dimensions)
+        with self._write() as conn:
+            row = conn.execute("SELECT digest FROM sources WHERE name = ?", (name,)).fetchone()
+            if row and row[0] == digest:
+                return 0
+            if row:
+                self._delete(conn, name)
+            path = self._vectors_path(conn)
+            start = self._file_rows(path)
+            # Vectors first: rows without chunk records are ignored by search
+            with open(path, "ab") as f:
+                f.write(vectors.tobytes())
+            source_id = conn.execute(
+                "INSERT INTO sources (name, digest, chunk_count, added) VALUES (?, ?, ?, ?)",
+                (name, digest, len(chunks), time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO chunks (row, source_id, text, tokens) VALUES (?, ?, ?, ?)",
+                ((start + i, source_id, chunk, estimate_tokens(chunk)) for i, chunk in enumerate(chunks))
+            )
+            self._bump_generation(conn)
+        return len(chunks)
+
+    def delete_source(self, name):
+        """Remove a source; its vector rows are zeroed and reclaimed by compact()"""
+        with self._write() as conn:
+            deleted = self._delete(conn, name)
+            if deleted:
+                self._bump_generation(conn)
+            return deleted
+
+    def _delete(self, conn, name):
+        row = conn.execute("SELECT id FROM sources WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        rows = [r for (r,) in conn.execute("SELECT row FROM chunks WHERE source_id = ? ORDER BY row", row)]
+        if rows:
+            path = self._vectors_path(conn)
+            writable = np.memmap(path, dtype=VECTOR_DTYPE, mode="r+", shape=(self._file_rows(path), self.dimensions))
+            writable[rows] = 0
+            writable.flush()
+            del writable
+        conn.execute("DELETE FROM chunks WHERE source_id = ?", row)
+        conn.execute("DELETE FROM sources WHERE id = ?", row)
+        return True
+
+    def compact(self):
+        """Rewrite the vectors without deleted rows into a new file and renumber the chunks"""
+        with self._write() as conn:
+            old_path = self._vectors_path(conn)
+            vectors = self._map(old_path)
+            live = [r for (r,) in conn.execute("SELECT row FROM chunks ORDER BY row")]
+            generation = int(self._meta(conn, "generation")) + 1
+            new_name = f"vectors.{generation}.f32"
+            with open(os.path.join(self.directory, new_name), "wb") as f:
+                for start in range(0, len(live), 10000):
+                    f.write(np.ascontiguousarray(vectors[live[start:start + 10000]]).tobytes())
+            del vectors
+            conn.execute("UPDATE chunks SET row = -1 - row")
+            conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", ((new, -1 - old) for new, old in enumerate(live)))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'vectors_file'", (new_name,))
+            self._bump_generation(conn)
+        # Readers still mapping the old file keep it alive until they remap
+        os.unlink(old_path)
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Return (score, source name, chunk text, tokens) for the best matching chunks"""
+        query_vector = embed([query], self.dimensions)[0]
+        if not query_vector.any():
+            return []
+        # Scores and chunk lookup come from one snapshot, so rows match the mapped file
+        with self._snapshot() as conn:
+            vectors = self._current_vectors(conn)
+            if not len(vectors):
+                return []
+            scores = vectors @ query_vector
+            k = min(top_k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            best = [int(row) for row in best if scores[row] > 0]
+            if not best:
+                return []
+            found = {
+                row: (name, text, tokens)
+                for row, name, text, tokens in conn.execute(
+                    f"SELECT chunks.row, sources.name, chunks.text, chunks.tokens FROM chunks "
+                    f"JOIN sources ON sources.id = chunks.source_id WHERE chunks.row IN ({','.join('?' * len(best))})",
+                    best
+                )
+            }
+        return [(float(scores[row]), *found[row]) for row in best if row in found]
+
+    def select_context(self, query, top_k=DEFAULT_TOP_K, token_budget=DEFAULT_TOKEN_BUDGET):
+        """Best matching chunks that fit the token budget, labelled with their source"""
+        selected = []
+        used = 0
+        for _, name, text, tokens in self.search(query, top_k):
+            if used + tokens > token_budget:
+                continue
+            selected.append(f"[{name}]\n{text}")
+            used += tokens
+        return "\n\n".join(selected), used
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+def get_knowledge_base():
+    """Knowledge base shared by all sessions in this process, mapped on first use"""
+    global _knowledge_base
+    with _knowledge_base_lock:
+        if _knowledge_base is None:
+            _knowledge_base = KnowledgeBase()
+        return _knowledge_base
@@ -0,0 +1,55 @@
+import os
+from src.utils.content_processor import truncate_text
+from src.utils.retrieval import estimate_tokens, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+
+SYSTEM_PROMPT = "You are a helpful AI assistant. If content is provided, base your answers on that content. Otherwise, provide helpful and informative responses based on your general knowledge."
+
+# "retrieval" sends the best matching chunks with each question; "stable_prefix"
+# sends the whole source up front so the provider can cache the prompt prefix
+PROMPT_LAYOUTS = {
+    "retrieval": "Relevant chunks per question",
+    "stable_prefix": "Stable prefix (whole document)",
+}
+DEFAULT_PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "retrieval")
+PREFIX_SOURCE_MAX_TOKENS = int(os.getenv("PREFIX_SOURCE_MAX_TOKENS", "24000"))
+
+def source_context(index, question, layout=DEFAULT_PROMPT_LAYOUT, top_k=DEFAULT_TOP_K, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Source text to send for a question and its token estimate"""
+    if layout == "stable_prefix":
+        # Identical on every turn, so it stays part of the cached prefix
+        content = truncate_text(index.text, PREFIX_SOURCE_MAX_TOKENS * 4)
+        return content, estimate_tokens(content)
+    return index.select_context(question, top_k=top_k, token_budget=token_budget)
+
+def build_messages(question, content, history_messages, layout=DEFAULT_PROMPT_LAYOUT):
+    """Assemble the request: system prompt, history and the current question"""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT}
+    ]
+
+    if layout == "stable_prefix":
+        # Leading messages never change between turns; new turns are only appended
+        if content:
+            messages.append({"role": "system", "content": f"Reference content:\n{content}"})
+        messages.extend(history_messages)
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    messages.extend(history_messages)
+    # Add the current question with context if available
+    if content:
+        messages.append({
+            "role": "user",
+            "content": f"Based on this content: {content}\n\nPlease answer: {question}"
+        })
+    else:
+        messages.append({
+            "role": "user",
+            "content": question
+        })
+    return messages
+
+def prompt_cache_ratio(stats):
+    """Share of prompt tokens served from the provider's prefix cache"""
+    total = stats.get("hit", 0) + stats.get("miss", 0)
+    return stats.get("hit", 0) / total if total else None
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+# Provider quota for the shared API key, across all sessions (0 means no limit)
+API_REQUESTS_PER_MINUTE = float(os.getenv("DEEPSEEK_RPM", "0"))
+API_TOKENS_PER_MINUTE = float(os.getenv("DEEPSEEK_TPM", "0"))
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`, holding at most one minute's worth"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount=1):
+        """Take `amount` tokens if available; otherwise return the seconds to wait"""
+        # Requests larger than the bucket would never fit, so cap them at capacity
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens have been taken"""
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def refund(self, amount):
+        """Return tokens that were reserved but not used"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+
+    def try_acquire(self, tokens):
+        """Take one request and `tokens` tokens if both are available; otherwise return the seconds to wait"""
+        if self.requests:
+            wait = self.requests.try_acquire(1)
+            if wait:
+                return wait
+        if self.tokens:
+            wait = self.tokens.try_acquire(tokens)
+            if wait:
+                if self.requests:
+                    self.requests.refund(1)
+                return wait
+        return 0.0
+
+    def refund(self, tokens):
+        if self.tokens and tokens > 0:
+            self.tokens.refund(tokens)
+
+    def release(self, tokens):
+        """Give back a reservation whose request was never sent: its request and its tokens"""
+        if self.requests:
+            self.requests.refund(1)
+        self.refund(tokens)
+
+    def settle(self, reserved, usage, max_tokens, generated):
+        """Refund the unused part of a reservation once its completion has ended
+
+        Without reported usage, the completion allowance comes back only if
+        nothing was generated (at most the prompt was spent).
+        """
+        used = (usage or {}).get("total_tokens")
+        if used:
+            self.refund(reserved - used)
+        elif not generated:
+            self.refund(max_tokens)
+
+    def levels(self):
+        """Tokens currently left in each bucket, for display"""
+        levels = {}
+        for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            if bucket:
+                with bucket._lock:
+                    bucket._refill()
+                    levels[name] = (bucket.tokens, bucket.capacity)
+        return levels
+
+_api_limiter = None
+_api_limiter_lock = threading.Lock()
+
+def get_api_limiter():
+    """Limiter for the shared API key, used by every session in this process"""
+    global _api_limiter
+    with _api_limiter_lock:
+        if _api_limiter is None:
+            _api_limiter = RateLimiter(API_REQUESTS_PER_MINUTE or None, API_TOKENS_PER_MINUTE or None)
+        return _api_limiter
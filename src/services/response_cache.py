@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+def response_cache_key(model, temperature, system_prompt, source_content, question, history, max_tokens):
+    """Stable hash of everything that determines the answer"""
+    payload = json.dumps({
+        "model": model,
+        "temperature": temperature,
+        "system": system_prompt,
+        "source": hashlib.sha256((source_content or "").encode()).hexdigest(),
+        "question": normalize_question(question),
+        "history": [[msg["role"], msg["content"]] for msg in history],
+        # A smaller budget gives a cut-off answer, which must not serve a larger one
+        "max_tokens": max_tokens,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """On-disk cache of completed answers with a TTL and LRU eviction"""
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Cached response for key, or None if missing or expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            # Drop expired entries, then the least recently used beyond the limit
+            conn.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Response cache shared by all sessions in this process"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
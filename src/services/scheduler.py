@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from src.services.api_service import retry_after_seconds
+from src.services.rate_limiter import get_api_limiter
+from src.utils.retrieval import estimate_tokens
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "16"))
+# How long to stop dispatching after a 429 without a Retry-After header
+RATE_LIMIT_PAUSE = float(os.getenv("DEEPSEEK_RATE_LIMIT_PAUSE", "5"))
+
+def estimated_job_tokens(job):
+    """Tokens to reserve for a job: its prompt plus the full completion allowance, and its history summary"""
+    tokens = sum(estimate_tokens(msg["content"]) for msg in job.messages) + job.max_tokens
+    if job.summary is not None and job.summary.text is None:
+        tokens += job.summary.estimated_tokens()
+    return tokens
+
+class FairScheduler:
+    """Round-robin queue of generation jobs across clients, in front of the API limiter
+
+    Each client (browser session) has its own FIFO. The dispatcher takes up to
+    `weight` jobs from one client before moving to the next, waits for the
+    shared requests/tokens-per-minute buckets, and only hands a job to the
+    worker pool when a worker is free, so a busy client cannot push others to
+    the back of the line. A 429 from the provider pauses dispatching for its
+    Retry-After as soon as a running job receives it, instead of letting every
+    queued job run into the same limit.
+    """
+
+    def __init__(self, limiter=None, max_workers=GENERATION_WORKERS):
+        self.limiter = limiter or get_api_limiter()
+        self.max_workers = max_workers
+        self.running = 0
+        self.dispatched = 0
+        self.rate_limited = 0
+        self.paused_until = 0.0
+        self._queues = OrderedDict()  # client id -> deque of (job, weight)
+        self._served = 0  # jobs taken from the client at the head of the rotation
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="generation-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, job, client_id=None, weight=1):
+        """Queue a job for `client_id` (jobs without one share a queue)"""
+        job.submitted = time.perf_counter()
+        with self._cond:
+            self._queues.setdefault(client_id, deque()).append((job, max(1, int(weight))))
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job):
+        """Drop a job that has not been dispatched yet; returns True if it was queued"""
+        with self._cond:
+            for client_id, queue in self._queues.items():
+                for entry in queue:
+                    if entry[0] is job:
+                        queue.remove(entry)
+                        if not queue:
+                            self._drop_client(client_id)
+                        self._cond.notify_all()
+                        return True
+        return False
+
+    def _drop_client(self, client_id):
+        if next(iter(self._queues)) == client_id:
+            self._served = 0
+        del self._queues[client_id]
+
+    def _dispatch_order(self):
+        """Queued jobs in the order they would be dispatched (caller holds the lock)"""
+        queues = [list(queue) for queue in self._queues.values()]
+        order = []
+        served = self._served
+        while any(queues):
+            for queue in queues:
+                if not queue:
+                    continue
+                take = max(1, queue[0][1] - served)
+                order.extend(job for job, _ in queue[:take])
+                del queue[:take]
+                served = 0
+        return order
+
+    def position(self, job):
+        """(1-based place in the dispatch order, total queued), or None once dispatched"""
+        with self._cond:
+            order = self._dispatch_order()
+        for index, queued in enumerate(order):
+            if queued is job:
+                return index + 1, len(order)
+        return None
+
+    def stats(self):
+        with self._cond:
+            queued = sum(len(queue) for queue in self._queues.values())
+            clients = len(self._queues)
+        return {
+            "queued": queued,
+            "clients": clients,
+            "running": self.running,
+            "dispatched": self.dispatched,
+            "rate_limited": self.rate_limited,
+            "paused_for": max(0.0, self.paused_until - time.monotonic()),
+            "limits": self.limiter.levels(),
+        }
+
+    def _next_job(self):
+        """Pop the next job in round-robin order, or None (caller holds the lock)"""
+        while self._queues:
+            client_id, queue = next(iter(self._queues.items()))
+            job, weight = queue[0]
+            if job.cancelled:
+                queue.popleft()
+                if not queue:
+                    self._drop_client(client_id)
+                continue
+            return client_id, queue, job, weight
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                wait = None
+                candidate = None
+                if self.running < self.max_workers:
+                    candidate = self._next_job()
+                pause = self.paused_until - time.monotonic()
+                if candidate is not None and pause > 0:
+                    wait = pause
+                elif candidate is not None:
+                    client_id, queue, job, weight = candidate
+                    reserved = estimated_job_tokens(job)
+                    wait = self.limiter.try_acquire(reserved)
+                    if not wait:
+                        queue.popleft()
+                        self._served += 1
+                        # Move on to the next client once this one used its turn
+                        if not queue:
+                            self._drop_client(client_id)
+                        elif self._served >= weight:
+                            self._queues.move_to_end(client_id)
+                            self._served = 0
+                        self.running += 1
+                        self.dispatched += 1
+                        job.future = self._executor.submit(self._run, job, reserved)
+                        continue
+                self._cond.wait(timeout=wait)
+
+    def _run(self, job, reserved):
+        # Always runs, even for a job cancelled while it waited for a thread,
+        # so its worker slot and reservation are always given back
+        try:
+            if job.cancelled:
+                # Nothing was sent
+                job.status = "cancelled"
+                self.limiter.release(reserved)
+            else:
+                self._generate(job, reserved)
+        finally:
+            with self._cond:
+                self.running -= 1
+                self._cond.notify_all()
+
+    def _generate(self, job, reserved):
+        job.on_rate_limited = self.pause_for
+        try:
+            job.run()
+        finally:
+            self.limiter.settle(reserved, job.total_usage, job.max_tokens, generated=bool(job.parts))
+
+    def pause_for(self, error):
+        """Stop dispatching for the Retry-After of a 429 (or RATE_LIMIT_PAUSE without one)"""
+        with self._cond:
+            self.rate_limited += 1
+            self.paused_until = max(
+                self.paused_until,
+                time.monotonic() + (retry_after_seconds(error) or RATE_LIMIT_PAUSE)
+            )
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Scheduler shared by every session in this process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
@@ -0,0 +1,229 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.utils.stats import percentile
+from src.utils.single_flight import get_source_flights
+
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", os.path.join(".cache", "request_metrics.jsonl"))
+# May contain "{pid}" for one file per process
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join(".cache", "metrics.prom"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the /metrics endpoint
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+QUANTILES = (50, 95, 99)
+
+# Stages in the order a request goes through them
+STAGES = ("pdf_spool", "source_load", "scrape", "pdf_extract", "index", "kb_add", "kb_search", "history", "prompt_build", "queue", "ttft", "completion", "total")
+
+_current_record = contextvars.ContextVar("current_request_record", default=None)
+
+class RequestRecord:
+    """Timings and token usage collected for one question"""
+
+    def __init__(self, kind="chat"):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.usage = None
+        self.status = None
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def finish(self, status, usage=None):
+        self.status = status
+        self.usage = usage or None
+        self.spans["total"] = time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "timestamp": self.timestamp,
+            "status": self.status,
+            "spans": self.spans,
+            "usage": self.usage,
+        }
+
+@contextmanager
+def track_request(record):
+    """Make `record` the target of span() calls in this context"""
+    token = _current_record.set(record)
+    try:
+        yield record
+    finally:
+        _current_record.reset(token)
+
+@contextmanager
+def span(name):
+    """Time a block into the current request record, if there is one"""
+    record = _current_record.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.add_span(name, time.perf_counter() - started)
+
+class MetricsRegistry:
+    """Keeps recent request records and exports them as JSONL and Prometheus text
+
+    Stage quantiles cover the last `window` records, while the _sum and _count
+    series and the request/token counters accumulate since the process started,
+    as Prometheus summaries and counters expect.
+    """
+
+    def __init__(self, jsonl_path=METRICS_JSONL_PATH, prom_path=METRICS_PROM_PATH, window=METRICS_WINDOW):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path.replace("{pid}", str(os.getpid())) if prom_path else prom_path
+        self.records = deque(maxlen=window)
+        self.stage_sums = defaultdict(float)
+        self.stage_counts = defaultdict(int)
+        self.status_counts = defaultdict(int)
+        self.token_totals = defaultdict(int)
+        self.export_errors = 0
+        self._lock = threading.Lock()
+        for path in (jsonl_path, self.prom_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, record):
+        """Store a finished record and refresh the exports"""
+        data = record.to_dict()
+        with self._lock:
+            self.records.append(data)
+            self.status_counts[data["status"]] += 1
+            for stage, seconds in data["spans"].items():
+                self.stage_sums[stage] += seconds
+                self.stage_counts[stage] += 1
+            for key in ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens", "prompt_cache_miss_tokens"):
+                self.token_totals[key] += (data["usage"] or {}).get(key) or 0
+            try:
+                self._export(data)
+            except Exception:
+                # Metrics must never fail the request that is being recorded
+                self.export_errors += 1
+
+    def _export(self, data):
+        """Append the record to the JSONL file and rewrite the Prometheus file (caller holds the lock)"""
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a") as f:
+                f.write(json.dumps(data) + "\n")
+        if self.prom_path:
+            # Write atomically so a scraper never reads a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.prom_path) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(self._prometheus_text())
+                # mkstemp creates the file private; the exporter may run as another user
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.prom_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    def stage_summary(self):
+        """p50/p95/p99 per stage over the recent window, in seconds"""
+        with self._lock:
+            values = defaultdict(list)
+            for data in self.records:
+                for stage, seconds in data["spans"].items():
+                    values[stage].append(seconds)
+        return {
+            stage: dict(count=len(values[stage]), **{f"p{q}": percentile(values[stage], q) for q in QUANTILES})
+            for stage in STAGES if values.get(stage)
+        }
+
+    def prometheus_text(self):
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self):
+        values = defaultdict(list)
+        for data in self.records:
+            for stage, seconds in data["spans"].items():
+                values[stage].append(seconds)
+
+        lines = [
+            "# HELP chatbot_stage_seconds Time spent per request stage (quantiles over recent requests, _sum/_count since start)",
+            "# TYPE chatbot_stage_seconds summary",
+        ]
+        for stage in sorted(self.stage_counts):
+            for q in QUANTILES:
+                value = percentile(values[stage], q)
+                if value is not None:
+                    lines.append(f'chatbot_stage_seconds{{stage="{stage}",quantile="{q / 100}"}} {value:.6f}')
+            lines.append(f'chatbot_stage_seconds_sum{{stage="{stage}"}} {self.stage_sums[stage]:.6f}')
+            lines.append(f'chatbot_stage_seconds_count{{stage="{stage}"}} {self.stage_counts[stage]}')
+
+        lines += ["# HELP chatbot_requests_total Requests by outcome", "# TYPE chatbot_requests_total counter"]
+        for status, count in sorted(self.status_counts.items()):
+            lines.append(f'chatbot_requests_total{{status="{status}"}} {count}')
+
+        lines += ["# HELP chatbot_tokens_total Tokens reported by the API", "# TYPE chatbot_tokens_total counter"]
+        for kind, count in sorted(self.token_totals.items()):
+            lines.append(f'chatbot_tokens_total{{kind="{kind}"}} {count}')
+
+        lines += ["# HELP chatbot_metrics_export_errors_total Failed writes of the metrics files", "# TYPE chatbot_metrics_export_errors_total counter"]
+        lines.append(f"chatbot_metrics_export_errors_total {self.export_errors}")
+
+        flights = get_source_flights().stats()
+        lines += ["# HELP chatbot_source_loads_total Source fetches and parses by outcome", "# TYPE chatbot_source_loads_total counter"]
+        for outcome in ("executed", "coalesced"):
+            for kind, count in sorted(flights[outcome].items()):
+                lines.append(f'chatbot_source_loads_total{{kind="{kind}",outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+_registry = None
+_registry_lock = threading.Lock()
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def get_metrics_registry():
+    """Registry shared by all sessions in this process"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve Prometheus text on http://0.0.0.0:<port>/metrics once per process (no-op for port 0)"""
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is not None:
+            return _metrics_server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = get_metrics_registry().prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError:
+            # Another worker process already serves this port
+            return None
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        return _metrics_server
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from src.utils.retrieval import estimate_tokens
+
+BOILERPLATE_REMOVAL = os.getenv("BOILERPLATE_REMOVAL", "1") != "0"
+# A block seen on this many different pages of a site is treated as boilerplate
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+MAX_DOMAINS = 500
+MAX_BLOCKS_PER_DOMAIN = 5000
+MAX_PAGES_PER_DOMAIN = 2000
+
+# Never content, and elements whose class or id says they are site chrome
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form", "button", "nav", "footer", "aside"]
+CHROME_PATTERN = re.compile(
+    r"(^|[\s_-])(cookies?|consent|gdpr|banner|nav|navbar|menu|breadcrumbs?|footer|sidebar|"
+    r"share|social|newsletter|subscribe|advert|ads|promo|popup|modal|skip-link)([\s_-]|$)",
+    re.IGNORECASE
+)
+BLOCK_TAGS = frozenset("""
+address article aside blockquote body dd details div dl dt fieldset figcaption figure h1 h2 h3 h4 h5 h6
+header li main ol p pre section summary table td th tr ul caption
+""".split())
+CONTAINER_TAGS = frozenset(["article", "main", "section", "div", "body"])
+MAX_LINK_DENSITY = 0.5
+# The main container is the deepest one holding this share of the page's text
+MAIN_CONTENT_SHARE = 0.7
+
+class TextBlock:
+    """Text of one block-level element and how much of it is link text"""
+
+    def __init__(self, element):
+        self.element = element
+        self.parts = []
+        self.link_chars = 0
+
+    @property
+    def text(self):
+        return " ".join(" ".join(self.parts).split())
+
+def block_hash(text):
+    return hashlib.sha1(text.lower().encode()).hexdigest()[:16]
+
+def split_blocks(soup):
+    """Group the page's text into TextBlocks by nearest block-level ancestor, in order"""
+    blocks = OrderedDict()
+    for string in soup.find_all(string=True):
+        text = string.strip()
+        if not text or string.parent is None:
+            continue
+        in_link = False
+        element = string.parent
+        while element is not None and element.name not in BLOCK_TAGS:
+            in_link = in_link or element.name == "a"
+            element = element.parent
+        if element is None:
+            continue
+        block = blocks.setdefault(id(element), TextBlock(element))
+        block.parts.append(text)
+        if in_link:
+            block.link_chars += len(text)
+    return [block for block in blocks.values() if block.text]
+
+def _main_container(blocks):
+    """Deepest container element holding most of the page's non-link text"""
+    totals = {}
+    depths = {}
+    for block in blocks:
+        weight = max(0, len(block.text) - block.link_chars)
+        element = block.element
+        depth = len(list(element.parents))
+        while element is not None:
+            if element.name in CONTAINER_TAGS:
+                totals[id(element)] = totals.get(id(element), 0) + weight
+                depths[id(element)] = (depth, element)
+            element = element.parent
+            depth -= 1
+    total = sum(max(0, len(b.text) - b.link_chars) for b in blocks)
+    if not total:
+        return None
+    candidates = [depths[key] for key, weight in totals.items() if weight >= MAIN_CONTENT_SHARE * total]
+    return max(candidates, key=lambda item: item[0])[1] if candidates else None
+
+class DomainBoilerplate:
+    """Learns which text blocks repeat across pages of the same site
+
+    Counts, per domain, on how many distinct pages each block hash appeared.
+    Blocks seen on at least `min_pages` pages (menus, banners, footers the
+    markup heuristics missed) are dropped. Also keeps per-page token savings
+    for display.
+    """
+
+    def __init__(self, min_pages=BOILERPLATE_MIN_PAGES):
+        self.min_pages = min_pages
+        self._domains = OrderedDict()  # domain -> {"pages": OrderedDict, "blocks": OrderedDict}
+        self._savings = OrderedDict()  # url -> {"raw_tokens", "tokens", "dropped_blocks"}
+        self._lock = threading.Lock()
+
+    def observe(self, url, hashes):
+        """Count each block hash once for this page (re-fetching a page does not recount)"""
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            site = self._domains.get(domain)
+            if site is None:
+                site = self._domains[domain] = {"pages": OrderedDict(), "blocks": OrderedDict()}
+                while len(self._domains) > MAX_DOMAINS:
+                    self._domains.popitem(last=False)
+            self._domains.move_to_end(domain)
+            if url in site["pages"]:
+                return
+            site["pages"][url] = True
+            if len(site["pages"]) > MAX_PAGES_PER_DOMAIN:
+                site["pages"].popitem(last=False)
+            blocks = site["blocks"]
+            for digest in set(hashes):
+                blocks[digest] = blocks.get(digest, 0) + 1
+                blocks.move_to_end(digest)
+            while len(blocks) > MAX_BLOCKS_PER_DOMAIN:
+                blocks.popitem(last=False)
+
+    def is_boilerplate(self, url, digest):
+        with self._lock:
+            site = self._domains.get(urlparse(url).netloc.lower())
+            return site is not None and site["blocks"].get(digest, 0) >= self.min_pages
+
+    def record_savings(self, url, raw_tokens, tokens, dropped_blocks):
+        with self._lock:
+            self._savings[url] = {"raw_tokens": raw_tokens, "tokens": tokens, "dropped_blocks": dropped_blocks}
+            self._savings.move_to_end(url)
+            while len(self._savings) > 200:
+                self._savings.popitem(last=False)
+
+    def savings(self, limit=20):
+        """Most recent pages first: url, tokens before and after extraction"""
+        with self._lock:
+            items = list(self._savings.items())[-limit:]
+        return [dict(stats, url=url) for url, stats in reversed(items)]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_boilerplate_registry():
+    """Per-domain boilerplate model shared by all sessions in this process"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DomainBoilerplate()
+        return _registry
+
+def extract_main_text(html, url):
+    """Main content of a page as one block per line, without site boilerplate
+
+    Drops non-content elements and anything marked up as navigation, banners or
+    footers, keeps the densest content container, skips link-heavy blocks, and
+    finally removes blocks learned to repeat across the site's pages.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(["script", "style", "noscript", "template"]):
+        element.decompose()
+    raw_tokens = estimate_tokens(" ".join(soup.get_text(" ").split()))
+    registry = get_boilerplate_registry()
+
+    if not BOILERPLATE_REMOVAL:
+        text = "\n".join(block.text for block in split_blocks(soup))
+        registry.record_savings(url, raw_tokens, estimate_tokens(text), 0)
+        return text
+
+    for element in soup(NON_CONTENT_TAGS):
+        element.decompose()
+    for element in soup.find_all(lambda tag: tag.get("id") or tag.get("class")):
+        # Already gone with an enclosing chrome element
+        if element.decomposed or element.name in ("body", "html", "main", "article"):
+            continue
+        marker = " ".join([element.get("id") or ""] + list(element.get("class") or []))
+        if CHROME_PATTERN.search(marker):
+            element.decompose()
+
+    blocks = split_blocks(soup)
+    registry.observe(url, [block_hash(block.text) for block in blocks])
+
+    main = _main_container(blocks)
+    content = [
+        block.text for block in blocks
+        if (main is None or block.element is main or main in block.element.parents)
+        and block.link_chars <= MAX_LINK_DENSITY * len(block.text)
+    ]
+    kept = [text for text in content if not registry.is_boilerplate(url, block_hash(text))]
+    # A site whose pages are all alike keeps its text rather than losing all of it
+    kept = kept or content
+
+    text = "\n".join(kept)
+    registry.record_savings(url, raw_tokens, estimate_tokens(text), len(blocks) - len(kept))
+    return text
+
+def strip_learned_boilerplate(url, text):
+    """Drop lines of previously extracted text that have since been learned as boilerplate
+
+    Used after a crawl so that pages fetched before the site's boilerplate was
+    known are cleaned too.
+    """
+    if not BOILERPLATE_REMOVAL or not text:
+        return text
+    registry = get_boilerplate_registry()
+    lines = text.split("\n")
+    kept = [line for line in lines if not registry.is_boilerplate(url, block_hash(line))]
+    if not kept or len(kept) == len(lines):
+        return text
+    stripped = "\n".join(kept)
+    saved = registry.savings(limit=200)
+    previous = next((page for page in saved if page["url"] == url), None)
+    if previous:
+        registry.record_savings(
+            url,
+            previous["raw_tokens"],
+            estimate_tokens(stripped),
+            previous["dropped_blocks"] + len(lines) - len(kept)
+        )
+    return stripped
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Process-wide limits, shared by every browser session on this server
+DEFAULT_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_MB", "256")) * 1024 * 1024
+DEFAULT_URL_TTL = int(os.getenv("CONTENT_CACHE_URL_TTL", "3600"))
+
+def url_cache_key(url):
+    """Cache key for scraped web pages (one URL, a URL list or a sitemap)"""
+    return "url:" + " ".join(url.replace(",", " ").split())
+
+def pdf_cache_key(data):
+    """Cache key for a PDF, based on a SHA-256 of its bytes"""
+    return pdf_digest_cache_key(hashlib.sha256(data).hexdigest())
+
+def pdf_digest_cache_key(sha256):
+    """Cache key for a PDF whose SHA-256 hex digest is already known"""
+    return f"pdf:{sha256}"
+
+class ContentCache:
+    """Thread-safe LRU cache with a byte-size budget and optional per-entry TTL"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value or None, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Return the cached value or None, without touching the counters or the LRU order"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                return None
+            return value
+
+    def put(self, key, value, size, ttl=None):
+        """Store a value, evicting least recently used entries to stay within budget"""
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Counters for display and monitoring"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_content_cache():
+    """Return the cache shared by all sessions in this process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ContentCache()
+        return _shared_cache
@@ -1,10 +1,31 @@
-import requests
-from bs4 import BeautifulSoup
-import PyPDF2
+import io
+import os
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from src.services import http_client
+from src.utils.upload_spool import open_mapped
+from src.utils.boilerplate import extract_main_text
+
+# Full-document PDF extraction is spread over worker processes above this size
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# Pages past this are ignored when ingesting a whole document
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
 
 def truncate_text(text, max_length=8000):
-    """Truncate text to a maximum length while keeping whole sentences"""
-    if len(text) <= max_length:
+    """Truncate text to a maximum length while keeping whole sentences
+
+    A max_length of None keeps the full text.
+    """
+    if max_length is None or len(text) <= max_length:
         return text
     
     # Find the last sentence boundary before max_length
@@ -14,34 +35,123 @@ def truncate_text(text, max_length=8000):
         return text[:last_period + 1]
     return truncated
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from uploaded PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return truncate_text(text)
-    except Exception as e:
-        return f"Error reading PDF: {str(e)}"
-
-def scrape_website(url):
-    """Scrape and clean web content"""
+def iter_pdf_pages(pdf_file, start=0, stop=None):
+    """Yield the text of each page in [start, stop), parsing pages lazily"""
+    # PyPDF2 and bs4 are imported on first use so chat-only sessions never load them
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    stop = len(pdf_reader.pages) if stop is None else min(stop, len(pdf_reader.pages))
+    for page_number in range(start, stop):
+        yield pdf_reader.pages[page_number].extract_text() or ""
+
+@contextmanager
+def _open_pdf_source(pdf_source):
+    """A readable stream for a path (memory-mapped), bytes or a file-like object"""
+    if isinstance(pdf_source, (str, os.PathLike)):
+        with open_mapped(pdf_source) as stream:
+            yield stream
+    elif isinstance(pdf_source, bytes):
+        yield io.BytesIO(pdf_source)
+    else:
+        yield pdf_source
+
+def _extract_page_range(pdf_source, start, stop):
+    """Worker task: extract the text of one page range from a path or bytes"""
+    with _open_pdf_source(pdf_source) as stream:
+        return "".join(text + "\n" for text in iter_pdf_pages(stream, start, stop))
+
+def _get_pdf_pool():
+    """Process pool shared by all sessions for full-document extraction"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+def _discard_pdf_pool(pool):
+    """Drop a pool whose worker died so the next extraction starts a fresh one"""
+    global _pdf_pool
+    pool.shutdown(wait=False)
+    with _pdf_pool_lock:
+        # Another extraction may already have replaced it
+        if _pdf_pool is pool:
+            _pdf_pool = None
+
+def _extract_pages_parallel(pdf_source, page_count):
+    """Extract page ranges of a large PDF (a path or bytes) across worker processes"""
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+    # Workers map the document from a file rather than each getting a pickled copy
+    tmp_path = None
+    if isinstance(pdf_source, bytes):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(pdf_source)
+        tmp_path = tmp.name
+    path = tmp_path or os.fspath(pdf_source)
+    pool = _get_pdf_pool()
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-            
-        # Get text and clean it
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return truncate_text(text)
-    except Exception as e:
-        return str(e) 
\ No newline at end of file
+        results = pool.map(
+            _extract_page_range,
+            [path] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges]
+        )
+        return "".join(results)
+    except BrokenProcessPool:
+        _discard_pdf_pool(pool)
+        return _extract_page_range(path, 0, page_count)
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+def extract_text_from_pdf(pdf_file, max_length=8000, max_pages=PDF_MAX_PAGES):
+    """Extract text from an uploaded PDF file or a path to one
+
+    With a max_length, pages are parsed only until the budget is met. Without one
+    (full-document ingestion), the first max_pages pages are extracted; large
+    PDFs are split into page ranges and extracted in a process pool. Paths are
+    memory-mapped rather than read into memory. Raises if the PDF cannot be read.
+    """
+    if max_length is None:
+        import PyPDF2
+        if isinstance(pdf_file, (str, os.PathLike)):
+            pdf_source = pdf_file
+        else:
+            pdf_source = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+        with _open_pdf_source(pdf_source) as stream:
+            page_count = len(PyPDF2.PdfReader(stream).pages)
+        if max_pages:
+            page_count = min(page_count, max_pages)
+        if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+            return _extract_pages_parallel(pdf_source, page_count)
+        return _extract_page_range(pdf_source, 0, page_count)
+
+    parts = []
+    length = 0
+    with _open_pdf_source(pdf_file) as stream:
+        for text in iter_pdf_pages(stream):
+            parts.append(text + "\n")
+            length += len(parts[-1])
+            if length > max_length:
+                break
+    return truncate_text("".join(parts), max_length)
+
+def fetch_page_text(url):
+    """Fetch a page and return its main content text, raising on failure
+
+    Pages are fetched over a shared keep-alive session; an unchanged page
+    (HTTP 304) reuses the text extracted on the previous fetch. Navigation,
+    banners and blocks repeated across the site are left out.
+    """
+    result = http_client.fetch(url)
+    if result.not_modified:
+        return result.extracted_text
+
+    text = extract_main_text(result.text, url)
+    http_client.remember_extracted(result, text)
+    return text
@@ -0,0 +1,132 @@
+import math
+import os
+import re
+import heapq
+from collections import Counter, defaultdict
+
+# Defaults for how much source text is sent with each question
+DEFAULT_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "2000"))
+DEFAULT_CHUNK_SIZE = 1200
+DEFAULT_CHUNK_OVERLAP = 200
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOP_WORDS = frozenset("""
+a an and are as at be but by do does for from has have how i in is it its me my of on or
+please so that the their them there these this those to was what when where which who why
+will with you your about can could would should tell give summarize explain
+""".split())
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def tokenize(text):
+    """Lowercase word tokens without stop words"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+def chunk_text(text, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP):
+    """Split text into overlapping chunks, preferring sentence and word boundaries"""
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Prefer to end on a sentence, then on a word
+            cut = text.rfind(". ", start + chunk_size // 2, end)
+            if cut != -1:
+                end = cut + 1
+            else:
+                cut = text.rfind(" ", start + overlap + 1, end)
+                if cut != -1:
+                    end = cut
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+
+        # Step back by the overlap and start on a word boundary
+        next_start = end - overlap
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return [chunk for chunk in chunks if chunk]
+
+class BM25Index:
+    """In-memory inverted index over the chunks of one source document"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75, text=None):
+        self.chunks = chunks
+        self.text = text if text is not None else "\n\n".join(chunks)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        self.chunk_tokens = [estimate_tokens(chunk) for chunk in chunks]
+
+        for chunk_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((chunk_id, tf))
+
+        self.avg_doc_length = (sum(self.doc_lengths) / len(chunks)) if chunks else 0
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def from_text(cls, text, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP):
+        """Chunk a full document and index it"""
+        return cls(chunk_text(text, chunk_size, overlap), text=text)
+
+    @property
+    def total_tokens(self):
+        return sum(self.chunk_tokens)
+
+    @property
+    def nbytes(self):
+        """Approximate memory footprint, used for cache budgeting"""
+        postings = sum(len(p) for p in self.postings.values())
+        return len(self.text) + sum(len(chunk) for chunk in self.chunks) + 64 * postings + 100 * len(self.postings)
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Return (score, chunk_id) pairs for the best matching chunks"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, tf in self.postings[term]:
+                norm = 1 - self.b + self.b * self.doc_lengths[chunk_id] / (self.avg_doc_length or 1)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return heapq.nlargest(top_k, ((score, chunk_id) for chunk_id, score in scores.items()))
+
+    def select_context(self, query, top_k=DEFAULT_TOP_K, token_budget=DEFAULT_TOKEN_BUDGET):
+        """Pick the most relevant chunks that fit the token budget, in document order
+
+        Falls back to the start of the document when nothing matches the query
+        (e.g. "summarize this").
+        """
+        ranked = [chunk_id for _, chunk_id in self.search(query, top_k)]
+        if not ranked:
+            ranked = range(len(self.chunks))
+
+        selected = []
+        used = 0
+        for chunk_id in ranked:
+            cost = self.chunk_tokens[chunk_id]
+            if used + cost > token_budget:
+                if selected:
+                    break
+                continue
+            selected.append(chunk_id)
+            used += cost
+            if len(selected) >= top_k:
+                break
+
+        return "\n\n".join(self.chunks[i] for i in sorted(selected)), used
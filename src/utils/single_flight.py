@@ -0,0 +1,77 @@
+import threading
+from collections import defaultdict
+
+class _Call:
+    """One in-flight execution and the outcome its waiters will share"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _kind(key):
+    """Counter label for a key: its prefix, e.g. "url" for "url:https://..." """
+    return key.split(":", 1)[0] if ":" in key else "other"
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and get the same result (or the same exception).
+    Nothing is remembered once the call finishes; caching the result is up to
+    the caller.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+        self.executed = defaultdict(int)
+        self.coalesced = defaultdict(int)
+
+    def do(self, key, fn):
+        """Return fn(), shared with every concurrent caller using the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed[_kind(key)] += 1
+            else:
+                self.coalesced[_kind(key)] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Executions and duplicate calls saved, by key prefix, plus calls running now"""
+        with self._lock:
+            return {
+                "executed": dict(self.executed),
+                "coalesced": dict(self.coalesced),
+                "in_flight": len(self._calls),
+            }
+
+_source_flights = None
+_source_flights_lock = threading.Lock()
+
+def get_source_flights():
+    """Coalescer for source fetches and parses, shared by all sessions in this process"""
+    global _source_flights
+    with _source_flights_lock:
+        if _source_flights is None:
+            _source_flights = SingleFlight()
+        return _source_flights
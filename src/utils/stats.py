@@ -0,0 +1,13 @@
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list of numbers (pct in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize_latencies(values, percentiles=(50, 95, 99)):
+    """Percentiles of a list of latencies, keyed like "p50" """
+    return {f"p{pct}": percentile(values, pct) for pct in percentiles}
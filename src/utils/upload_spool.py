@@ -0,0 +1,157 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+# Uploads are copied here once, named by content hash, and shared by all sessions
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(".cache", "uploads"))
+SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_MB", "2048")) * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("PDF_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+SPOOL_CHUNK_SIZE = 1024 * 1024
+# Spool files used more recently than this are never trimmed, so one spooled by
+# a session is still there when it goes on to extract it
+SPOOL_MIN_AGE = float(os.getenv("UPLOAD_SPOOL_MIN_AGE", "60"))
+
+class UploadTooLargeError(ValueError):
+    """An upload is bigger than the configured limit"""
+
+class SpooledFile:
+    """An upload on disk: its path, SHA-256 and size"""
+
+    def __init__(self, path, sha256, size):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+_spooled = OrderedDict()  # upload file_id -> SpooledFile
+_spooled_lock = threading.Lock()
+_in_use = Counter()  # spool path -> readers holding it
+
+def _check_size(size, max_bytes):
+    if max_bytes and size > max_bytes:
+        raise UploadTooLargeError(
+            f"File is {size / 2**20:.1f} MB; the limit is {max_bytes / 2**20:.0f} MB"
+        )
+
+def spool_upload(upload, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy an upload (file-like or path) to the spool directory, hashing as it streams
+
+    The copy is read in 1 MB chunks, so no second in-memory copy is made. A path
+    is hashed in place rather than copied. Re-spooling the same Streamlit upload
+    (same file_id) is free, so asking several questions about one PDF hashes it
+    only once. Raises UploadTooLargeError past max_bytes.
+    """
+    if isinstance(upload, (str, os.PathLike)):
+        _check_size(os.path.getsize(upload), max_bytes)
+        digest = hashlib.sha256()
+        with open(upload, "rb") as f:
+            for block in iter(lambda: f.read(SPOOL_CHUNK_SIZE), b""):
+                digest.update(block)
+        return SpooledFile(os.fspath(upload), digest.hexdigest(), os.path.getsize(upload))
+
+    file_id = getattr(upload, "file_id", None)
+    if file_id is not None:
+        with _spooled_lock:
+            spooled = _spooled.get(file_id)
+        if spooled is not None and os.path.exists(spooled.path):
+            try:
+                # Counts as recently used for the trim
+                os.utime(spooled.path)
+            except FileNotFoundError:
+                pass
+            else:
+                return spooled
+
+    if getattr(upload, "size", None) is not None:
+        _check_size(upload.size, max_bytes)
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    position = upload.tell()
+    upload.seek(0)
+    tmp = tempfile.NamedTemporaryFile(dir=SPOOL_DIR, suffix=".part", delete=False)
+    try:
+        with tmp:
+            for block in iter(lambda: upload.read(SPOOL_CHUNK_SIZE), b""):
+                size += len(block)
+                _check_size(size, max_bytes)
+                digest.update(block)
+                tmp.write(block)
+        path = os.path.join(SPOOL_DIR, f"{digest.hexdigest()}.pdf")
+        # Identical uploads from different sessions end up as one file
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    finally:
+        upload.seek(position)
+
+    spooled = SpooledFile(path, digest.hexdigest(), size)
+    if file_id is not None:
+        with _spooled_lock:
+            _spooled[file_id] = spooled
+            while len(_spooled) > 256:
+                _spooled.popitem(last=False)
+    _trim_spool(keep=path)
+    return spooled
+
+@contextmanager
+def hold_spooled(path):
+    """Keep a spool file from being trimmed while it is being read"""
+    with _spooled_lock:
+        _in_use[path] += 1
+    try:
+        yield path
+    finally:
+        with _spooled_lock:
+            _in_use[path] -= 1
+            if not _in_use[path]:
+                del _in_use[path]
+
+def _trim_spool(keep=None, max_bytes=SPOOL_MAX_BYTES, min_age=SPOOL_MIN_AGE):
+    """Delete the least recently used spool files beyond the directory budget
+
+    Files used in the last `min_age` seconds or held by a reader are kept,
+    even if that leaves the directory over budget for a while.
+    """
+    entries = []
+    total = os.path.getsize(keep) if keep else 0
+    cutoff = time.time() - min_age
+    with _spooled_lock:
+        held = set(_in_use)
+    for name in os.listdir(SPOOL_DIR):
+        path = os.path.join(SPOOL_DIR, name)
+        if name.endswith(".pdf") and path != keep:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if stat.st_mtime < cutoff and path not in held:
+                entries.append((stat.st_mtime, stat.st_size, path))
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            # Open maps stay valid after unlink; the space is freed when they close
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+@contextmanager
+def open_mapped(path):
+    """Read-only memory map of a file, usable wherever a binary stream is expected"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield f
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
@@ -0,0 +1,3 @@
+"""
+Correctness tests for the app's services and components
+"""
@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import isolate_stores
+
+@pytest.fixture
+def isolated_stores(tmp_path, monkeypatch):
+    """Keep the conversation store and knowledge base the app opens out of the working tree"""
+    isolate_stores(str(tmp_path), monkeypatch)
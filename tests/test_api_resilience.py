@@ -0,0 +1,75 @@
+"""
+Behaviour of the API resilience policy: circuit breaker states and probes, backoff and Retry-After
+"""
+import email.utils
+import time
+from types import SimpleNamespace
+import pytest
+from src.services.api_service import CircuitBreaker, CircuitOpenError, RetryPolicy, retry_after_seconds
+
+def http_error(headers):
+    return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05, probe_timeout=10)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_breaker_lets_another_probe_through_after_a_lost_one():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, probe_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    # The probe never reports back
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+def test_retry_after_is_honoured_in_full():
+    policy = RetryPolicy(max_delay=8, max_retry_after=60)
+    assert policy.delay(0, http_error({"retry-after": "20"})) == 20
+    assert policy.delay(0, http_error({"retry-after-ms": "1500"})) == 1.5
+    # Too long a wait gives up instead of sleeping
+    assert policy.delay(0, http_error({"retry-after": "120"})) is None
+
+def test_backoff_without_retry_after_is_capped():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2)
+    assert all(0 <= policy.delay(attempt) <= 2 for attempt in range(10))
+
+def test_malformed_or_dated_retry_after():
+    assert retry_after_seconds(http_error({"retry-after": "soon"})) is None
+    assert retry_after_seconds(http_error({"retry-after-ms": "later"})) is None
+    assert retry_after_seconds(SimpleNamespace()) is None
+    # HTTP dates are GMT, also when written without a zone
+    when = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert retry_after_seconds(http_error({"retry-after": when})) == pytest.approx(30, abs=2)
+    naive = when.replace(" GMT", "")
+    assert retry_after_seconds(http_error({"retry-after": naive})) == pytest.approx(30, abs=2)
+    assert retry_after_seconds(http_error({"retry-after": "Thu, 01 Jan 1970 00:00:00 GMT"})) == 0
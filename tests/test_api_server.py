@@ -0,0 +1,72 @@
+"""
+Validation of /chat request bodies, and client disconnects while the headless
+API server streams or waits for an answer
+"""
+import asyncio
+import pytest
+from src.api_server import BadRequest, answer_job, parse_chat_request, stream_job
+
+def test_chat_flags_must_be_booleans():
+    question, _, _, _ = parse_chat_request({"question": "hi", "use_cache": False, "stream": True})
+    assert question == "hi"
+    for key in ("use_cache", "stream"):
+        with pytest.raises(BadRequest, match=key) as error:
+            parse_chat_request({"question": "hi", key: "false"})
+        assert error.value.status == 400
+
+def test_max_tokens_must_be_an_integer():
+    assert parse_chat_request({"question": "hi", "max_tokens": 50})[3] == 50
+    for value in (2.7, "5", True, None):
+        with pytest.raises(BadRequest, match="max_tokens"):
+            parse_chat_request({"question": "hi", "max_tokens": value})
+    with pytest.raises(BadRequest, match="between"):
+        parse_chat_request({"question": "hi", "max_tokens": 0})
+
+class StreamingJob:
+    """A job that keeps streaming until cancelled"""
+
+    def __init__(self):
+        self.parts = ["partial "]
+        self.status = "running"
+        self.cancelled = False
+
+    @property
+    def finished(self):
+        return self.status != "running"
+
+    def cancel(self):
+        self.cancelled = True
+        self.status = "cancelled"
+
+def test_client_disconnect_still_records_the_request():
+    job = StreamingJob()
+    finished = []
+
+    async def disconnect_after_first_event():
+        events = stream_job(job, lambda aborted=False: finished.append("aborted" if aborted else job.status))
+        first = await events.__anext__()
+        await events.aclose()
+        return first
+
+    assert "partial" in asyncio.run(disconnect_after_first_event())
+    assert job.cancelled
+    assert finished == ["aborted"]
+
+class DisconnectingRequest:
+    """A request whose client goes away after `polls` checks"""
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    async def is_disconnected(self):
+        self.polls -= 1
+        return self.polls < 0
+
+def test_client_disconnect_cancels_a_non_streaming_answer():
+    job = StreamingJob()
+    finished = []
+    finish = lambda aborted=False: finished.append("aborted" if aborted else job.status)
+    response = asyncio.run(answer_job(job, DisconnectingRequest(polls=2), finish))
+    assert response.status_code == 499
+    assert job.cancelled
+    assert finished == ["aborted"]
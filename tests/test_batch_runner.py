@@ -0,0 +1,93 @@
+"""
+Behaviour of the headless batch runner: resuming skips answered records,
+invalid or failed records get error lines and are retried, and the report
+aggregates the run, and cached answers are only reused for the same --max-tokens
+"""
+import io
+import json
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html
+from src import batch_runner
+from src.services import response_cache, telemetry
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_batch_run_resumes_and_retries_failures(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    # Request metrics go to tmp_path rather than the working tree
+    registry = telemetry.MetricsRegistry(
+        jsonl_path=str(tmp_path / "request_metrics.jsonl"), prom_path=str(tmp_path / "metrics.prom")
+    )
+    monkeypatch.setattr(telemetry, "_registry", registry)
+    with FakeOpenAIServer(completion_tokens=5, pages={"/doc.html": make_html(20_000)}) as server:
+        source = f"{server.base_url}/doc.html"
+        input_path = tmp_path / "questions.jsonl"
+        input_path.write_text("\n".join([
+            json.dumps({"id": "done", "source": source, "question": "Already answered?"}),
+            json.dumps({"id": "again", "source": source, "question": "What is the cache?"}),
+            json.dumps({"id": "empty", "source": source}),
+            "not json",
+        ]) + "\n")
+        output_path = tmp_path / "answers.jsonl"
+        output_path.write_text(
+            json.dumps({"id": "done", "status": "ok", "answer": "earlier"}) + "\n"
+            + json.dumps({"id": "again", "status": "error", "error": "timeout"}) + "\n"
+        )
+        argv = [str(input_path), "-o", str(output_path), "--rpm", "0", "--base-url", server.base_url]
+
+        assert batch_runner.main(argv) == 1
+        first_run = read_lines(output_path)[2:]
+        by_id = {result["id"]: result for result in first_run}
+        assert set(by_id) == {"again", "empty", "4"}
+        assert by_id["again"]["status"] == "ok" and by_id["again"]["answer"].startswith("word0")
+        assert by_id["empty"]["status"] == "error" and "question" in by_id["empty"]["error"]
+        assert by_id["4"]["status"] == "error"
+        assert server.requests == 1
+        assert "1/3 records answered" in capsys.readouterr().err
+        assert len(registry.records) == 3
+
+        # Only the records without a successful answer are tried again
+        assert batch_runner.main(argv) == 1
+        second_run = read_lines(output_path)[5:]
+        assert sorted(result["id"] for result in second_run) == ["4", "empty"]
+        assert server.requests == 1
+        assert "0/2 records answered" in capsys.readouterr().err
+
+def test_cached_answers_are_keyed_by_max_tokens(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(telemetry, "_registry", telemetry.MetricsRegistry(
+        jsonl_path=str(tmp_path / "request_metrics.jsonl"), prom_path=str(tmp_path / "metrics.prom")
+    ))
+    monkeypatch.setattr(response_cache, "_response_cache", response_cache.ResponseCache(str(tmp_path / "responses.sqlite3")))
+    with FakeOpenAIServer(completion_tokens=5, pages={"/doc.html": make_html(20_000)}) as server:
+        input_path = tmp_path / "questions.jsonl"
+        input_path.write_text(json.dumps({"id": "q", "source": f"{server.base_url}/doc.html", "question": "What is the cache?"}) + "\n")
+
+        def run(max_tokens, name):
+            output_path = tmp_path / name
+            argv = [str(input_path), "-o", str(output_path), "--rpm", "0", "--base-url", server.base_url,
+                    "--use-cache", "--max-tokens", str(max_tokens)]
+            assert batch_runner.main(argv) == 0
+            return read_lines(output_path)[0]
+
+        assert not run(1, "short.jsonl").get("cached")
+        # An answer cut off at 1 token is not served to a run that allows 4000
+        assert not run(4000, "long.jsonl").get("cached")
+        assert run(1, "short_again.jsonl")["cached"]
+        assert server.requests == 2
+
+def test_print_report_aggregates_answered_records():
+    results = [
+        {"status": "ok", "latency": 1.0, "ttft": 0.2, "usage": {"total_tokens": 100}},
+        {"status": "ok", "latency": 3.0, "ttft": None, "usage": {"total_tokens": 300}},
+        {"status": "error", "latency": 9.0},
+    ]
+    out = io.StringIO()
+    batch_runner.print_report(results, 2.0, out=out)
+    report = out.getvalue()
+    assert "2/3 records answered in 2.0s" in report
+    assert "throughput: 1.00 records/s, 200 tokens/s" in report
+    # Failed records are left out of the latency percentiles
+    assert "latency: p50=2.00s" in report
+    assert "time to first token: p50=0.20s" in report
@@ -0,0 +1,26 @@
+"""
+Correctness of boilerplate learning and main text extraction
+"""
+from src.utils.boilerplate import DomainBoilerplate, extract_main_text
+
+def test_boilerplate_needs_distinct_pages_per_domain():
+    registry = DomainBoilerplate(min_pages=3)
+    registry.observe("https://example.com/a", ["menu", "a"])
+    # Re-fetching a page does not count again
+    registry.observe("https://example.com/a", ["menu", "a"])
+    registry.observe("https://example.com/b", ["menu", "b"])
+    assert not registry.is_boilerplate("https://example.com/c", "menu")
+    registry.observe("https://EXAMPLE.com/c", ["menu", "menu", "c"])
+    assert registry.is_boilerplate("https://example.com/d", "menu")
+    assert not registry.is_boilerplate("https://example.com/d", "a")
+    assert not registry.is_boilerplate("https://other.org/", "menu")
+
+def test_extract_main_text_drops_nested_chrome():
+    article = "Real text here. " * 20
+    html = (
+        f"<body><article><p>{article}</p></article>"
+        '<div id="footer"><div class="footer-inner">(c) example</div></div>'
+        '<div class="sidebar"><div class="menu"><a href="/">Home</a></div></div></body>'
+    )
+    text = extract_main_text(html, "https://nested.example/a")
+    assert text == article.strip()
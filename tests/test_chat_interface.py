@@ -0,0 +1,64 @@
+"""
+Behaviour of the chat UI across Streamlit reruns
+"""
+from streamlit.testing.v1 import AppTest
+from benchmarks.fixtures import APP_PATH
+from src.services import conversation_store
+from src.services.generation_worker import GenerationJob
+
+def test_rerun_reads_older_messages_once(isolated_stores, monkeypatch):
+    """Messages paged in from the conversation store are not re-read on every rerun"""
+    store = conversation_store.get_conversation_store()
+    conversation_id = store.new_conversation_id()
+    messages = [
+        {"role": role, "content": f"{role} message {i}"}
+        for i in range(15)
+        for role in ("user", "assistant")
+    ]
+    store.append(conversation_id, messages)
+    reads = []
+    recent = store.recent
+    monkeypatch.setattr(store, "recent", lambda *args, **kwargs: reads.append(args) or recent(*args, **kwargs))
+
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.session_state.api_key = "benchmark"
+    at.session_state.conversation_id = conversation_id
+    at.session_state.chat_history = messages[-10:]
+    for _ in range(3):
+        at.run()
+        assert not at.exception
+    assert len(reads) == 1
+    assert [msg.markdown[0].value for msg in at.chat_message][0] == "user message 5"
+
+def running_app(conversation_id, job, history):
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.session_state.api_key = "benchmark"
+    at.session_state.conversation_id = conversation_id
+    at.session_state.chat_history = history
+    at.session_state.generation_job = job
+    return at
+
+def test_clear_chat_history_cancels_the_running_answer(isolated_stores):
+    """Clearing the chat mid-answer stops the job instead of committing it to the new conversation"""
+    job = GenerationJob(("question", "", None), None, [], meta={"conversation_id": "old"})
+    at = running_app("old", job, [{"role": "user", "content": "question"}])
+    at.run()
+    assert not at.exception
+    at.button(key="clear_chat").click().run()
+    assert not at.exception
+    assert job.cancelled and job.status == "cancelled"
+    assert at.session_state.generation_job is None
+    assert at.session_state.chat_history == []
+    assert at.session_state.conversation_id != "old"
+
+def test_answer_from_a_cleared_conversation_is_dropped(isolated_stores):
+    """A job that finishes after its conversation was replaced leaves the new history alone"""
+    job = GenerationJob(("question", "", None), None, [], meta={"conversation_id": "old"})
+    job.parts.append("answer")
+    job.status = "done"
+    at = running_app("new", job, [])
+    at.run()
+    assert not at.exception
+    assert at.session_state.generation_job is None
+    assert at.session_state.chat_history == []
+    assert conversation_store.get_conversation_store().recent("new", 10) == []
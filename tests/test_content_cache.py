@@ -0,0 +1,27 @@
+"""
+Behaviour of the shared content cache: LRU eviction within the byte budget and per-entry TTL
+"""
+import time
+from src.utils.content_cache import ContentCache
+
+def test_content_cache_evicts_least_recently_used():
+    cache = ContentCache(max_bytes=10)
+    cache.put("a", "A", 4)
+    cache.put("b", "B", 4)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", 4)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["bytes"] == 8 and cache.stats()["evictions"] == 1
+    # Larger than the whole budget: not stored, nothing evicted
+    cache.put("huge", "H", 11)
+    assert cache.get("huge") is None and cache.stats()["entries"] == 2
+
+def test_content_cache_ttl_and_replace():
+    cache = ContentCache(max_bytes=100)
+    cache.put("url", "old", 10, ttl=0.02)
+    cache.put("url", "new", 30, ttl=0.02)
+    assert cache.get("url") == "new" and cache.stats()["bytes"] == 30
+    time.sleep(0.03)
+    assert cache.get("url") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["bytes"] == 0
@@ -0,0 +1,42 @@
+"""
+Behaviour of the SQLite conversation store: paging, export and concurrent appends
+"""
+import threading
+from src.services.conversation_store import ConversationStore
+
+def test_conversation_store_paging_and_export(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    conversation = store.new_conversation_id()
+    other = store.new_conversation_id()
+    messages = store.append(conversation, [
+        {"role": "user", "content": f"message {i}", "cached": i % 2 == 0} for i in range(7)
+    ])
+    store.append(other, [{"role": "user", "content": "elsewhere"}])
+    assert all("id" in message for message in messages)
+
+    newest = store.recent(conversation, 3)
+    assert [m["content"] for m in newest] == ["message 4", "message 5", "message 6"]
+    older = store.recent(conversation, 3, before_id=newest[0]["id"])
+    assert [m["content"] for m in older] == ["message 1", "message 2", "message 3"]
+    assert store.count(conversation) == 7 and store.count(conversation, before_id=newest[0]["id"]) == 4
+    assert older[1]["cached"] is True and older[0]["cached"] is False
+
+    exported = list(store.iter_messages(conversation, batch_size=2))
+    assert [m["content"] for m in exported] == [f"message {i}" for i in range(7)]
+
+def test_conversation_store_concurrent_appends(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    conversations = [store.new_conversation_id() for _ in range(4)]
+
+    def write(conversation):
+        for i in range(50):
+            store.append(conversation, [{"role": "user", "content": str(i)}, {"role": "assistant", "content": str(i)}])
+
+    threads = [threading.Thread(target=write, args=(conversation,)) for conversation in conversations]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for conversation in conversations:
+        assert store.count(conversation) == 100
+        assert [m["content"] for m in store.iter_messages(conversation)][::2] == [str(i) for i in range(50)]
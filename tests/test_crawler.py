@@ -0,0 +1,97 @@
+"""
+Behaviour of multi-URL ingestion: sitemaps and sitemap indexes expand to their
+pages, URL lists are crawled in order, requests to one host are spaced out and
+a failed crawl raises instead of returning text
+"""
+import pytest
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html
+from src.services import crawler
+from src.services.chat_service import SourceError, load_source
+from src.services.crawler import HostRateLimiter, crawl, scrape_sources
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+def urlset(urls):
+    return (
+        f"<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='{SITEMAP_NS}'>"
+        + "".join(f"<url><loc>{url}</loc></url>" for url in urls)
+        + "</urlset>"
+    )
+
+def sitemap_index(urls):
+    return (
+        f"<?xml version='1.0' encoding='UTF-8'?><sitemapindex xmlns='{SITEMAP_NS}'>"
+        + "".join(f"<sitemap><loc>{url}</loc></sitemap>" for url in urls)
+        + "</sitemapindex>"
+    )
+
+@pytest.fixture
+def site(monkeypatch):
+    """A fake site with four pages and no per-host delay"""
+    monkeypatch.setattr(crawler, "_host_limiter", HostRateLimiter(rate=0))
+    pages = {f"/page{i}.html": make_html(5_000, seed=i) for i in range(4)}
+    with FakeOpenAIServer(pages=pages) as server:
+        yield server
+
+def page_url(server, i):
+    return f"{server.base_url}/page{i}.html"
+
+def fetched_pages(server):
+    return sorted(path for path, _ in server.page_requests if path.startswith("/page"))
+
+def test_urlset_expands_to_its_pages(site):
+    site.pages["/sitemap.xml"] = urlset([page_url(site, i) for i in range(3)])
+    text = scrape_sources(f"{site.base_url}/sitemap.xml")
+    for i in range(3):
+        assert f"Source: {page_url(site, i)}\n" in text
+    assert page_url(site, 3) not in text
+    assert fetched_pages(site) == ["/page0.html", "/page1.html", "/page2.html"]
+
+def test_sitemap_index_follows_nested_sitemaps(site):
+    site.pages["/a.xml"] = urlset([page_url(site, 0), page_url(site, 1)])
+    site.pages["/b.xml"] = urlset([page_url(site, 3)])
+    site.pages["/sitemap_index.xml"] = sitemap_index([f"{site.base_url}/a.xml", f"{site.base_url}/b.xml"])
+    text = scrape_sources(f"{site.base_url}/sitemap_index.xml")
+    for i in (0, 1, 3):
+        assert f"Source: {page_url(site, i)}\n" in text
+    assert fetched_pages(site) == ["/page0.html", "/page1.html", "/page3.html"]
+
+def test_whitespace_url_list_keeps_order(site):
+    urls = [page_url(site, i) for i in (2, 0, 1)]
+    text = scrape_sources(f"  {urls[0]}\n{urls[1]}   {urls[2]}  {urls[0]}")
+    positions = [text.index(f"Source: {url}\n") for url in urls]
+    assert positions == sorted(positions)
+    assert text.count(f"Source: {urls[0]}\n") == 1
+
+def test_missing_pages_are_skipped(site):
+    text = scrape_sources(f"{page_url(site, 0)}, {site.base_url}/missing.html")
+    assert f"Source: {page_url(site, 0)}\n" in text
+    assert "missing.html" not in text
+
+def test_no_fetched_page_raises(site):
+    with pytest.raises(ValueError, match="None of the 2 pages could be fetched"):
+        scrape_sources(f"{site.base_url}/missing.html {site.base_url}/gone.html")
+    with pytest.raises(SourceError):
+        load_source(url=f"{site.base_url}/missing.html")
+
+def test_page_starting_with_error_is_loaded(site):
+    """Page text is never read as an error message"""
+    paragraph = "Error codes returned by the service are listed below with their meaning. " * 20
+    site.pages["/errors.html"] = f"<html><body><article><p>{paragraph}</p></article></body></html>"
+    url = f"{site.base_url}/errors.html"
+    assert scrape_sources(url).startswith("Error codes")
+    assert load_source(url=url).chunks
+
+def test_requests_to_one_host_are_spaced():
+    pages = {f"/p{i}.html": make_html(2_000, seed=i) for i in range(4)}
+    with FakeOpenAIServer(pages=pages) as first, FakeOpenAIServer(pages=pages) as second:
+        limiter = HostRateLimiter(rate=20)
+        urls = [f"{first.base_url}/p{i}.html" for i in range(4)] + [f"{second.base_url}/p0.html"]
+        results = crawl(urls, max_workers=5, rate_limiter=limiter)
+    assert all(error is None for _, _, error in results)
+    times = sorted(at for _, at in first.page_requests)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.04
+    # Another host does not wait behind the first one's queue
+    assert second.page_requests[0][1] < times[-1]
@@ -0,0 +1,28 @@
+"""
+Behaviour of background generation: Stop ends a job at once, even while its call is retrying
+"""
+import threading
+import time
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from src.services.api_service import DeepSeekAPI
+from src.services.generation_worker import GenerationJob
+
+def test_cancel_stops_retries_at_once():
+    with FakeOpenAIServer(error_rate=1.0, error_status=503, retry_after=5) as server:
+        api_service = DeepSeekAPI("test", base_url=server.base_url)
+        job = GenerationJob(None, api_service, [{"role": "user", "content": "hi"}])
+        worker = threading.Thread(target=job.run)
+        worker.start()
+        deadline = time.monotonic() + 5
+        while server.requests == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+
+        cancelled = time.perf_counter()
+        job.cancel()
+        assert job.status == "cancelled"
+        worker.join(timeout=2)
+        assert not worker.is_alive()
+        assert time.perf_counter() - cancelled < 1
+        assert server.requests == 1
+        assert job.status == "cancelled" and job.error is None
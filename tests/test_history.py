@@ -0,0 +1,144 @@
+"""
+Behaviour of the token-budgeted history: the rolling summary is written by the
+generation job, extended rather than redone, and never written on the script thread
+"""
+from types import SimpleNamespace
+from src.services.chat_service import prepare_request
+from src.services.generation_worker import GenerationJob
+from src.services.history_manager import HistoryManager, drop_summarized
+
+def completion(text, total_tokens=0):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=total_tokens, completion_tokens=0, total_tokens=total_tokens)
+    )
+
+class SummarizingAPI:
+    """Records summary requests instead of calling the API"""
+
+    model = "fake"
+    temperature = 0
+
+    def __init__(self):
+        self.calls = []
+
+    def format_message_for_api(self, msg):
+        return {"role": msg["role"], "content": msg["content"]}
+
+    def create_completion(self, messages, max_tokens=2000, **kwargs):
+        self.calls.append(messages[1]["content"])
+        return completion(f"summary {len(self.calls)}", total_tokens=50)
+
+def exchanges(start, count):
+    history = []
+    for i in range(start, start + count):
+        history += [{"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": f"answer {i}"}]
+    return history
+
+def build_and_summarize(manager, history, api):
+    messages = manager.build(history)
+    if manager.pending_summary is not None:
+        manager.pending_summary.run(api)
+        manager.pending_summary.commit(manager.state)
+    return messages
+
+def test_build_never_calls_the_api():
+    api = SummarizingAPI()
+    manager = HistoryManager(api, {}, token_budget=10_000, keep_turns=1)
+    history = exchanges(0, 3)
+    messages = manager.build(history)
+    assert api.calls == []
+    pending = manager.pending_summary
+    assert messages[0] is pending.message and messages[1:] == history[-2:]
+
+    pending.run(api)
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation: summary 1"}
+    assert pending.usage["total_tokens"] == 50
+
+def test_history_summary_is_extended_not_redone():
+    api = SummarizingAPI()
+    state = {}
+    manager = HistoryManager(api, state, token_budget=10_000, keep_turns=1)
+    history = exchanges(0, 3)
+    build_and_summarize(manager, history, api)
+    assert len(api.calls) == 1
+
+    # Same history: the cached summary is reused
+    messages = manager.build(history)
+    assert manager.pending_summary is None
+    assert messages[0]["content"].endswith("summary 1")
+
+    # One more exchange: only the newly folded messages are summarized, after the old summary
+    history += exchanges(3, 1)
+    build_and_summarize(manager, history, api)
+    assert len(api.calls) == 2
+    assert api.calls[1].startswith("EARLIER SUMMARY: summary 1")
+    assert "question 2" in api.calls[1] and "question 1" not in api.calls[1]
+
+def test_failed_summary_falls_back_to_the_transcript():
+    class FailingAPI(SummarizingAPI):
+        def create_completion(self, messages, max_tokens=2000, **kwargs):
+            raise RuntimeError("upstream down")
+
+    api = FailingAPI()
+    manager = HistoryManager(api, {}, token_budget=10_000, keep_turns=1)
+    messages = manager.build(exchanges(0, 2))
+    manager.pending_summary.run(api)
+    assert "ASSISTANT: answer 0" in messages[0]["content"]
+
+def test_history_fits_the_token_budget_and_prunes_counts():
+    api = SummarizingAPI()
+    state = {}
+    manager = HistoryManager(api, state, token_budget=400, keep_turns=10)
+    history = [{"role": "user", "content": "word " * 200}, {"role": "assistant", "content": "reply " * 200}] + exchanges(0, 2)
+    messages = build_and_summarize(manager, history, api)
+    # The long exchange is folded into the summary although it is within keep_turns
+    assert messages[1:] == history[2:]
+    assert len(api.calls) == 1
+
+    manager.build(history[-2:])
+    assert len(state["history_token_counts"]) == 2
+
+def test_drop_summarized_keeps_the_context_unchanged():
+    api = SummarizingAPI()
+    state = {}
+    manager = HistoryManager(api, state, token_budget=10_000, keep_turns=1)
+    history = exchanges(0, 5)
+    before = build_and_summarize(manager, history, api)
+    assert drop_summarized(history, state, max_messages=4) == 6
+    assert len(history) == 4
+    assert manager.build(history) == before
+    assert len(api.calls) == 1
+
+class FakeStream(list):
+    def close(self):
+        pass
+
+class StreamingAPI(SummarizingAPI):
+    """Summaries as above; answers stream one delta"""
+
+    breaker = None
+
+    def create_completion(self, messages, stream=False, max_tokens=2000, **kwargs):
+        if not stream:
+            return super().create_completion(messages, max_tokens=max_tokens)
+        self.answered_with = messages
+        chunk = SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="answer"))], usage=None)
+        return FakeStream([chunk])
+
+def test_generation_job_writes_the_summary_before_answering():
+    api = StreamingAPI()
+    state = {"history_token_budget": 10_000, "history_keep_turns": 1}
+    request = prepare_request(api, "next question", None, exchanges(0, 3), state)
+    assert api.calls == [] and request.summary is not None
+    # Keyed by what the summary will cover, so the key is known before it is written
+    again = prepare_request(api, "next question", None, exchanges(0, 3), dict(state))
+    assert again.cache_key == request.cache_key
+
+    job = GenerationJob(None, api, request.messages, summary=request.summary)
+    job.run()
+    assert job.status == "done" and len(api.calls) == 1
+    assert api.answered_with[1]["content"] == "Summary of the earlier conversation: summary 1"
+
+    request.summary.commit(state)
+    assert prepare_request(api, "next question", None, exchanges(0, 3), state).summary is None
@@ -0,0 +1,33 @@
+"""
+Behaviour of the shared HTTP client: an unchanged page is revalidated with its
+ETag and its previously extracted text reused
+"""
+import pytest
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html
+from src.services import http_client
+from src.utils import content_processor
+from src.utils.content_processor import fetch_page_text
+
+def no_extraction(html, url):
+    pytest.fail("an unchanged page was extracted again")
+
+def test_unchanged_page_reuses_extracted_text(monkeypatch):
+    with FakeOpenAIServer(pages={"/etag.html": make_html(20_000)}, etags=True) as server:
+        url = f"{server.base_url}/etag.html"
+        first = fetch_page_text(url)
+        monkeypatch.setattr(content_processor, "extract_main_text", no_extraction)
+        second = fetch_page_text(url)
+    assert second == first and first
+    statuses = [entry["status"] for entry in http_client.recent_fetches() if entry["url"] == url]
+    assert statuses == [304, 200]
+
+def test_changed_page_is_fetched_again():
+    with FakeOpenAIServer(pages={"/changed.html": make_html(20_000)}, etags=True) as server:
+        url = f"{server.base_url}/changed.html"
+        first = fetch_page_text(url)
+        server.pages["/changed.html"] = make_html(20_000, seed=1)
+        second = fetch_page_text(url)
+    assert second != first
+    statuses = [entry["status"] for entry in http_client.recent_fetches() if entry["url"] == url]
+    assert statuses == [200, 200]
@@ -0,0 +1,52 @@
+"""
+Behaviour of the knowledge base: updates, compaction and instances sharing one directory
+"""
+from src.services.knowledge_base import KnowledgeBase
+
+def chunks_about(topic, count=3):
+    return [f"{topic} section {i} explains {topic} in detail" for i in range(count)]
+
+def top_source(kb, query):
+    results = kb.search(query, top_k=1)
+    return results[0][1] if results else None
+
+def test_knowledge_base_add_replace_delete_compact(tmp_path):
+    kb = KnowledgeBase(str(tmp_path))
+    assert kb.add_source("volcanoes", chunks_about("volcanoes")) == 3
+    assert kb.add_source("glaciers", chunks_about("glaciers")) == 3
+    # Same content again is a no-op
+    assert kb.add_source("volcanoes", chunks_about("volcanoes")) == 0
+    assert top_source(kb, "volcanoes in detail") == "volcanoes"
+
+    assert kb.add_source("volcanoes", chunks_about("earthquakes", 2)) == 2
+    assert top_source(kb, "earthquakes in detail") == "volcanoes"
+    assert kb.stats() == {"sources": 2, "chunks": 5, "rows": 8, "dead_rows": 3, "bytes": 8 * kb.row_bytes}
+
+    assert kb.delete_source("glaciers")
+    assert not kb.delete_source("glaciers")
+    assert top_source(kb, "glaciers in detail") != "glaciers"
+    kb.compact()
+    assert kb.stats()["rows"] == 2 and kb.stats()["dead_rows"] == 0
+    assert top_source(kb, "earthquakes in detail") == "volcanoes"
+
+    reopened = KnowledgeBase(str(tmp_path))
+    assert [name for name, _, _ in reopened.sources()] == ["volcanoes"]
+    assert top_source(reopened, "earthquakes in detail") == "volcanoes"
+
+def test_knowledge_base_instances_share_a_directory(tmp_path):
+    """Two instances stand in for two processes: rows must not collide and compaction must be seen"""
+    first = KnowledgeBase(str(tmp_path))
+    second = KnowledgeBase(str(tmp_path))
+    topics = ["volcanoes", "glaciers", "deserts", "rainforests", "tundra", "reefs"]
+    for i, topic in enumerate(topics):
+        (first if i % 2 else second).add_source(topic, chunks_about(topic))
+    for kb in (first, second):
+        assert kb.stats()["rows"] == 3 * len(topics)
+        assert all(top_source(kb, f"{topic} in detail") == topic for topic in topics)
+
+    first.delete_source("volcanoes")
+    first.compact()
+    assert top_source(second, "volcanoes in detail") != "volcanoes"
+    assert all(top_source(second, f"{topic} in detail") == topic for topic in topics[1:])
+    second.add_source("volcanoes", chunks_about("volcanoes"))
+    assert all(top_source(first, f"{topic} in detail") == topic for topic in topics)
@@ -0,0 +1,58 @@
+"""
+Behaviour of PDF extraction: parallel page ranges match a serial pass, a page
+budget stops parsing early and a broken process pool is replaced
+"""
+import io
+from concurrent.futures.process import BrokenProcessPool
+from benchmarks.fixtures import make_pdf
+from src.utils import content_processor
+from src.utils.content_processor import extract_text_from_pdf
+
+def test_parallel_extraction_matches_serial(monkeypatch):
+    data = make_pdf(20)
+    serial = content_processor._extract_page_range(data, 0, 20)
+    monkeypatch.setattr(content_processor, "PDF_PARALLEL_MIN_PAGES", 8)
+    monkeypatch.setattr(content_processor, "PDF_PAGES_PER_TASK", 3)
+    monkeypatch.setattr(content_processor, "PDF_WORKERS", 2)
+    ranges = []
+    real_parallel = content_processor._extract_pages_parallel
+    monkeypatch.setattr(
+        content_processor, "_extract_pages_parallel",
+        lambda source, page_count: ranges.append(page_count) or real_parallel(source, page_count)
+    )
+    assert extract_text_from_pdf(io.BytesIO(data), max_length=None) == serial
+    assert ranges == [20]
+    assert "Page 1." in serial and "Page 20." in serial
+
+def test_page_budget_stops_parsing_early(monkeypatch):
+    data = make_pdf(50)
+    parsed = []
+    real_iter = content_processor.iter_pdf_pages
+
+    def counting_iter(*args, **kwargs):
+        for text in real_iter(*args, **kwargs):
+            parsed.append(1)
+            yield text
+
+    monkeypatch.setattr(content_processor, "iter_pdf_pages", counting_iter)
+    text = extract_text_from_pdf(io.BytesIO(data), max_length=3000)
+    assert 0 < len(text) <= 3000
+    assert len(parsed) < 5
+
+def test_broken_pool_is_replaced(monkeypatch):
+    class BrokenPool:
+        shut_down = False
+
+        def map(self, *args):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True):
+            self.shut_down = True
+
+    broken = BrokenPool()
+    monkeypatch.setattr(content_processor, "_pdf_pool", broken)
+    data = make_pdf(6)
+    text = content_processor._extract_pages_parallel(data, 6)
+    assert text == content_processor._extract_page_range(data, 0, 6)
+    assert broken.shut_down
+    assert content_processor._pdf_pool is None
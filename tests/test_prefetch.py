@@ -0,0 +1,47 @@
+"""
+Behaviour of source prefetching: the answer reuses the prefetched index, a
+failed prefetch is retried and a queued one is skipped
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html
+from src.services import chat_service
+from src.services.chat_service import prefetch_source, await_prefetch, load_source, SourceError
+
+def test_answer_reuses_prefetched_index():
+    with FakeOpenAIServer(pages={"/prefetched.html": make_html(20_000)}) as server:
+        url = f"{server.base_url}/prefetched.html"
+        future = prefetch_source(url=url)
+        index = await_prefetch(future, url=url)
+        assert index is future.result()
+        assert load_source(url=url) is index
+    assert [path for path, _ in server.page_requests] == ["/prefetched.html"]
+
+def test_failed_prefetch_is_retried():
+    with FakeOpenAIServer() as server:
+        url = f"{server.base_url}/late.html"
+        future = prefetch_source(url=url)
+        with pytest.raises(SourceError):
+            future.result()
+        server.pages["/late.html"] = make_html(20_000)
+        index = await_prefetch(future, url=url)
+    assert index.chunks
+    assert len(server.page_requests) == 2
+
+def test_queued_prefetch_is_loaded_directly(monkeypatch):
+    busy = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    busy.submit(release.wait)
+    monkeypatch.setattr(chat_service, "_prefetch_executor", busy)
+    try:
+        with FakeOpenAIServer(pages={"/queued.html": make_html(20_000)}) as server:
+            url = f"{server.base_url}/queued.html"
+            future = prefetch_source(url=url)
+            index = await_prefetch(future, url=url)
+        assert index.chunks
+        assert future.cancelled()
+    finally:
+        release.set()
+        busy.shutdown()
@@ -0,0 +1,22 @@
+"""
+Behaviour of the on-disk response cache: TTL expiry and least-recently-used eviction
+"""
+import time
+from src.services.response_cache import ResponseCache
+
+def test_response_cache_ttl_and_lru(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl=3600, max_entries=2)
+    cache.put("a", "answer a")
+    time.sleep(0.01)
+    cache.put("b", "answer b")
+    time.sleep(0.01)
+    assert cache.get("a") == "answer a"
+    time.sleep(0.01)
+    cache.put("c", "answer c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer a" and cache.get("c") == "answer c"
+
+    expiring = ResponseCache(str(tmp_path / "expiring.sqlite3"), ttl=0.02)
+    expiring.put("a", "answer a")
+    time.sleep(0.03)
+    assert expiring.get("a") is None
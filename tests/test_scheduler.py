@@ -0,0 +1,173 @@
+"""
+Behaviour of the fair scheduler and the rate limits it dispatches within
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import pytest
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import wait_until
+from src.services.api_service import DeepSeekAPI
+from src.services.generation_worker import GenerationJob, cancel_generation
+from src.services.rate_limiter import RateLimiter, TokenBucket
+from src.services.scheduler import FairScheduler
+
+def test_token_bucket_wait_and_refund():
+    bucket = TokenBucket(60)  # one token per second
+    assert bucket.try_acquire(60) == 0
+    assert bucket.try_acquire(1) == pytest.approx(1, abs=0.05)
+    bucket.refund(30)
+    assert bucket.try_acquire(30) == 0
+    # Larger than the bucket: capped, so it can still succeed eventually
+    assert bucket.try_acquire(1000) == pytest.approx(60, abs=0.1)
+
+def test_rate_limiter_gives_back_the_request_when_tokens_are_short():
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=100)
+    assert limiter.try_acquire(100) == 0
+    assert limiter.try_acquire(50) > 0
+    assert limiter.levels()["requests"][0] == pytest.approx(9, abs=0.01)
+
+def test_rate_limiter_settle():
+    limiter = RateLimiter(tokens_per_minute=1000)
+    limiter.try_acquire(600)
+    limiter.settle(600, {"total_tokens": 100}, max_tokens=500, generated=True)
+    assert limiter.levels()["tokens"][0] == pytest.approx(900, abs=1)
+    limiter.try_acquire(600)
+    limiter.settle(600, None, max_tokens=500, generated=False)
+    assert limiter.levels()["tokens"][0] == pytest.approx(800, abs=1)
+
+class FakeJob:
+    """Just enough of GenerationJob for the scheduler"""
+
+    def __init__(self, name, log, gate=None):
+        self.name = name
+        self.log = log
+        self.gate = gate
+        self.messages = [{"role": "user", "content": "hi"}]
+        self.max_tokens = 10
+        self.usage = {}
+        self.total_usage = {}
+        self.summary = None
+        self.parts = []
+        self.error = None
+        self.status = "queued"
+        self.cancelled = False
+        self.finished = threading.Event()
+
+    def run(self):
+        self.log.append(self.name)
+        if self.gate:
+            self.gate.wait()
+        self.status = "done"
+        self.finished.set()
+
+def test_scheduler_round_robin_with_weights():
+    log = []
+    gate = threading.Event()
+    scheduler = FairScheduler(limiter=RateLimiter(), max_workers=1)
+    blocker = scheduler.submit(FakeJob("blocker", log, gate))
+    wait_until(lambda: log)
+    jobs = [scheduler.submit(FakeJob(f"a{i}", log), client_id="a") for i in range(4)]
+    jobs += [scheduler.submit(FakeJob(f"b{i}", log), client_id="b") for i in range(2)]
+    jobs.append(scheduler.submit(FakeJob("c0", log), client_id="c", weight=2))
+    jobs.append(scheduler.submit(FakeJob("c1", log), client_id="c", weight=2))
+    assert scheduler.position(jobs[4]) == (2, 8)
+
+    gate.set()
+    for job in [blocker] + jobs:
+        assert job.finished.wait(5)
+    assert log == ["blocker", "a0", "b0", "c0", "c1", "a1", "b1", "a2", "a3"]
+    wait_until(lambda: scheduler.stats()["running"] == 0)
+
+def test_scheduler_cancel_drops_queued_jobs():
+    log = []
+    gate = threading.Event()
+    scheduler = FairScheduler(limiter=RateLimiter(), max_workers=1)
+    scheduler.submit(FakeJob("blocker", log, gate))
+    wait_until(lambda: log)
+    dropped = scheduler.submit(FakeJob("dropped", log), client_id="a")
+    kept = scheduler.submit(FakeJob("kept", log), client_id="a")
+    assert scheduler.cancel(dropped)
+    assert not scheduler.cancel(dropped)
+    gate.set()
+    assert kept.finished.wait(5)
+    assert log == ["blocker", "kept"]
+
+class FailingAPI:
+    breaker = None
+
+    def create_completion(self, *args, **kwargs):
+        raise RuntimeError("upstream down")
+
+class HeldExecutor:
+    """Holds submitted work until released, like a pool whose threads are all busy"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=4)
+
+    def submit(self, fn, *args):
+        future = Future()
+
+        def work():
+            self.release.wait()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+        self._pool.submit(work)
+        return future
+
+def test_cancel_while_waiting_for_a_thread_returns_slot_and_tokens():
+    limiter = RateLimiter(tokens_per_minute=100_000)
+    scheduler = FairScheduler(limiter=limiter, max_workers=2)
+    scheduler._executor = executor = HeldExecutor()
+    jobs = [GenerationJob(None, FailingAPI(), [{"role": "user", "content": "hi"}], max_tokens=100) for _ in range(2)]
+    for job in jobs:
+        scheduler.submit(job)
+    wait_until(lambda: all(job.future is not None for job in jobs))
+    assert limiter.levels()["tokens"][0] < 100_000
+
+    cancel_generation(jobs[0])
+    executor.release.set()
+    wait_until(lambda: all(job.finished for job in jobs) and scheduler.stats()["running"] == 0)
+    assert [job.status for job in jobs] == ["cancelled", "failed"]
+    assert limiter.levels()["tokens"][0] == pytest.approx(100_000, abs=1)
+
+def test_cancel_before_run_returns_the_request():
+    limiter = RateLimiter(requests_per_minute=2)
+    scheduler = FairScheduler(limiter=limiter, max_workers=2)
+    scheduler._executor = executor = HeldExecutor()
+    cancelled = GenerationJob(None, FailingAPI(), [{"role": "user", "content": "hi"}], max_tokens=100)
+    scheduler.submit(cancelled)
+    wait_until(lambda: cancelled.future is not None)
+    cancel_generation(cancelled)
+    executor.release.set()
+    wait_until(lambda: scheduler.stats()["running"] == 0)
+
+    # The cancelled job sent nothing, so the full 2 requests per minute are left
+    log = []
+    jobs = [scheduler.submit(FakeJob(f"job{i}", log)) for i in range(2)]
+    for job in jobs:
+        assert job.finished.wait(5)
+    assert sorted(log) == ["job0", "job1"]
+
+def test_scheduler_pauses_on_a_429_while_the_job_still_retries():
+    with FakeOpenAIServer(error_rate=1.0, error_status=429, retry_after=30) as server:
+        api_service = DeepSeekAPI("test", base_url=server.base_url)
+        scheduler = FairScheduler(limiter=RateLimiter(), max_workers=2)
+        first = scheduler.submit(GenerationJob(None, api_service, [{"role": "user", "content": "hi"}]))
+        wait_until(lambda: scheduler.stats()["rate_limited"] == 1)
+        assert first.status == "running"
+        assert scheduler.stats()["paused_for"] > 25
+
+        second = scheduler.submit(GenerationJob(None, api_service, [{"role": "user", "content": "hi"}]))
+        time.sleep(0.2)
+        assert scheduler.position(second) == (1, 1)
+        assert server.requests == 1
+        for job in (first, second):
+            scheduler.cancel(job)
+            job.cancel()
+        wait_until(lambda: first.finished and scheduler.stats()["running"] == 0)
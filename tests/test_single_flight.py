@@ -0,0 +1,69 @@
+"""
+Behaviour of single-flight: concurrent loads of one source share a single call
+"""
+import threading
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.fixtures import make_html, wait_until
+from src.services.chat_service import load_source
+from src.utils.content_cache import get_content_cache
+from src.utils.single_flight import SingleFlight
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def load():
+        calls.append(1)
+        release.wait()
+        return object()
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do("url:x", load))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: flights.stats()["coalesced"].get("url") == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    assert flights.stats()["in_flight"] == 0
+    # Nothing is remembered once the call finished
+    flights.do("url:x", load)
+    assert len(calls) == 2
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait()
+        raise ValueError("bad source")
+
+    def call():
+        try:
+            flights.do("pdf:y", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: flights.stats()["coalesced"].get("pdf") == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3 and all(error is errors[0] for error in errors)
+
+def test_cold_load_counts_one_miss():
+    cache = get_content_cache()
+    with FakeOpenAIServer(pages={"/cold.html": make_html(20_000)}) as server:
+        before = cache.stats()
+        load_source(url=f"{server.base_url}/cold.html")
+        after = cache.stats()
+        load_source(url=f"{server.base_url}/cold.html")
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] == before["hits"]
+    assert cache.stats()["hits"] - after["hits"] == 1
@@ -0,0 +1,37 @@
+"""
+Behaviour of the metrics registry: concurrent records, atomic exports and export failures
+"""
+import os
+import threading
+from src.services.telemetry import MetricsRegistry, RequestRecord
+
+def test_metrics_registry_concurrent_records(tmp_path):
+    registry = MetricsRegistry(str(tmp_path / "metrics.jsonl"), str(tmp_path / "metrics.prom"))
+
+    def record_many():
+        for _ in range(100):
+            record = RequestRecord()
+            record.add_span("ttft", 0.1)
+            record.finish("done", {"prompt_tokens": 3, "completion_tokens": 2})
+            registry.record(record)
+
+    threads = [threading.Thread(target=record_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.export_errors == 0
+    assert len((tmp_path / "metrics.jsonl").read_text().splitlines()) == 800
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert 'chatbot_requests_total{status="done"} 800' in prom
+    assert 'chatbot_tokens_total{kind="prompt_tokens"} 2400' in prom
+    assert sorted(os.listdir(tmp_path)) == ["metrics.jsonl", "metrics.prom"]
+
+def test_metrics_export_failure_does_not_fail_the_request(tmp_path):
+    registry = MetricsRegistry(None, str(tmp_path / "gone" / "metrics.prom"))
+    os.rmdir(tmp_path / "gone")
+    record = RequestRecord()
+    record.finish("done")
+    registry.record(record)
+    assert registry.export_errors == 1
+    assert registry.status_counts["done"] == 1
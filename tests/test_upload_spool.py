@@ -0,0 +1,63 @@
+"""
+Behaviour of the upload spool: oversize uploads are refused and the directory
+is trimmed to its budget without deleting files that are in use
+"""
+import io
+import os
+import time
+import pytest
+from src.utils import upload_spool
+from src.utils.upload_spool import UploadTooLargeError, hold_spooled, spool_upload
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_spool, "SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+def spool_file(directory, name, size, age):
+    path = directory / f"{name}.pdf"
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+def test_oversize_upload_is_refused(spool_dir):
+    with pytest.raises(UploadTooLargeError):
+        spool_upload(io.BytesIO(b"x" * 3000), max_bytes=2000)
+    # Found while streaming, after part of it was written: nothing is left behind
+    assert os.listdir(spool_dir) == []
+
+    upload = io.BytesIO(b"x" * 10)
+    upload.size = 3000
+    with pytest.raises(UploadTooLargeError):
+        spool_upload(upload, max_bytes=2000)
+
+def test_trim_deletes_least_recently_used_first(spool_dir):
+    oldest = spool_file(spool_dir, "oldest", 400, age=300)
+    older = spool_file(spool_dir, "older", 400, age=200)
+    newest = spool_file(spool_dir, "newest", 400, age=100)
+    upload_spool._trim_spool(max_bytes=900, min_age=60)
+    assert not os.path.exists(oldest)
+    assert os.path.exists(older) and os.path.exists(newest)
+
+def test_trim_keeps_recent_and_held_files(spool_dir):
+    held = spool_file(spool_dir, "held", 400, age=300)
+    old = spool_file(spool_dir, "old", 400, age=200)
+    recent = spool_file(spool_dir, "recent", 400, age=1)
+    with hold_spooled(held):
+        upload_spool._trim_spool(max_bytes=0, min_age=60)
+    assert os.path.exists(held) and os.path.exists(recent)
+    assert not os.path.exists(old)
+    # Released again, it can go
+    upload_spool._trim_spool(max_bytes=0, min_age=60)
+    assert not os.path.exists(held)
+
+def test_respooling_an_upload_marks_it_used(spool_dir):
+    upload = io.BytesIO(b"%PDF-1.4 spool test")
+    upload.file_id = "spool-test-upload"
+    spooled = spool_upload(upload)
+    stale = time.time() - 300
+    os.utime(spooled.path, (stale, stale))
+    assert spool_upload(upload) is spooled
+    upload_spool._trim_spool(max_bytes=0, min_age=60)
+    assert os.path.exists(spooled.path)